@@ -1,15 +1,32 @@
+from datetime import date
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from io import BytesIO
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.oxml.ns import qn
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from termreport.ingest import load_assessment, load_batch, TemplateError, CLASS_COL
+from termreport import charts, interactive
+from termreport.insights import analyse, class_summary, format_class_summary
+from termreport.items import alpha_rating, item_analysis
+from termreport.report import build_report, render_report, DOCX_MIME, IMAGE_QUALITY
+from termreport.export import build_class_pdf, learner_reports_zip, PDF_MIME, ZIP_MIME
+from termreport.cube import build_cube, stats_cube
+from termreport.jobs import report_jobs
+from termreport.store import datasets
+from termreport.admin import begin_rerun, sidebar_panel
+from termreport.editing import MarkSheet, diff_marks
+from termreport.workers import pool as worker_pool
 
 # Streamlit Config
 st.set_page_config(page_title="📊 Learner Performance Dashboard", layout="wide")
+timings = begin_rerun()
+worker_pool.start()  # Shared by every session; chart rendering and report assembly run here
+
+# Download formats: file name and MIME type
+REPORT_FORMATS = {
+    "Word Document": ("learner_performance_report.docx", DOCX_MIME),
+    "PDF": ("learner_performance_report.pdf", PDF_MIME),
+    "Learner reports": ("learner_reports.zip", ZIP_MIME),
+}
 
 # Custom Styling with Explicit Colors
 st.markdown("""
@@ -56,10 +73,14 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+PIES_PER_PAGE = 4  # Distribution charts shown per page
+CHART_BACKENDS = ["Interactive", "Static images"]
+
 # Sidebar Configuration
 st.sidebar.title("📊 Dashboard Options")
 st.sidebar.markdown("### File Upload")
 uploaded_file = st.sidebar.file_uploader("Upload your Excel file", type=["xlsx"])
+batch_mode = st.sidebar.checkbox("Batch mode: analyse every class sheet in the workbook", value=False)
 
 # Add manual navigation to second page
 st.sidebar.markdown("### Pages")
@@ -76,8 +97,9 @@ for section_name, section_id in sections.items():
     st.sidebar.markdown(f'<a href="#{section_id}" style="text-decoration: none; color: #003366;">{section_name}</a>', unsafe_allow_html=True)
 
 st.sidebar.markdown("### Chart Settings")
-chart_options = ["Vertical Bar", "Scatter Plot", "Box Plot"]
-selected_chart = st.sidebar.selectbox("Select chart type for Total Marks per Learner", chart_options, index=0)
+selected_chart = st.sidebar.selectbox("Select chart type for Total Marks per Learner", charts.CHART_OPTIONS, index=0)
+chart_backend = st.sidebar.radio("Chart rendering", CHART_BACKENDS, index=0, key="chart_backend",
+                                 help="Interactive charts are drawn in your browser; static images are drawn on the server.")
 
 # Main content
 st.header("HOËRSKOOL SAUL DAMON")
@@ -99,328 +121,252 @@ st.info("""
 if 'file_processed' not in st.session_state:
     st.session_state['file_processed'] = False
 
-# Process file only if uploaded and not yet processed, or if a new file is uploaded
-if uploaded_file and (not st.session_state['file_processed'] or st.session_state.get('uploaded_file') != uploaded_file):
-    # Read the Excel file
-    df_raw = pd.read_excel(uploaded_file, header=None)
-    header_row = next((i for i, row in df_raw.iterrows() if any("name of learner" in str(cell).lower() for cell in row)), None)
-    total_row = next((i for i, row in df_raw.iterrows() if any("totaal:" in str(cell).lower() for cell in row)), None)
-    
-    if header_row is not None:
-        df = pd.read_excel(uploaded_file, skiprows=header_row)
-        df.columns = df.columns.str.strip()
-        name_col = next((col for col in df.columns if "name of learner" in col.lower()), None)
-        if name_col:
-            name_col_idx = df.columns.get_loc(name_col)
-            question_cols = [col for col in df.columns[name_col_idx + 1:] if df[col].dtype in ['int64', 'float64']]
-            if question_cols:
-                df[question_cols] = df[question_cols].fillna(0)
-                df['Total'] = df[question_cols].sum(axis=1)
-                
-                # Extract total possible marks from the "TOTAAL:" row
-                if total_row is not None:
-                    total_value = df_raw.iloc[total_row].apply(str).str.extract(r'(\d+)').dropna().iloc[0, 0]
-                    max_possible = int(total_value)  # e.g., 50
-                else:
-                    max_possible = 50  # Default if not found
-                df['Percentage'] = (df['Total'] / max_possible * 100)
-                
-                # Store processed data in session_state
-                st.session_state['df'] = df
-                st.session_state['name_col'] = name_col
-                st.session_state['question_cols'] = question_cols
-                st.session_state['file_processed'] = True
-                st.session_state['uploaded_file'] = uploaded_file
-            else:
-                st.error("No numeric question columns found after 'NAME OF LEARNER'.")
-                st.stop()
-        else:
-            st.error("Could not find 'NAME OF LEARNER' column.")
-            st.stop()
-    else:
-        st.error("Could not locate 'NAME OF LEARNER' row.")
+# A corrected dataset evicted from the shared store is restored from this session's copy
+mark_sheet = st.session_state.get('mark_sheet')
+if mark_sheet is not None and mark_sheet.key not in datasets:
+    datasets.put(mark_sheet.key, mark_sheet.assessment)
+
+# Process file only if uploaded and not yet processed, if a new file is uploaded,
+# or if its dataset was evicted from the shared store
+if uploaded_file and (not st.session_state['file_processed'] or st.session_state.get('upload_id') != uploaded_file.file_id
+                      or st.session_state.get('batch_mode') != batch_mode
+                      or st.session_state.get('dataset_key') not in datasets):
+    # Parse the template sheet(s) (cached on the file contents)
+    try:
+        with timings.span("parse", batch=batch_mode):
+            assessment = load_batch(uploaded_file, timings.session) if batch_mode else load_assessment(uploaded_file)
+    except TemplateError as e:
+        st.error(str(e))
         st.stop()
 
+    # The parsed dataset lives in the shared store; the session only keeps its key
+    st.session_state['dataset_key'] = assessment.key
+    st.session_state.pop('mark_sheet', None)
+    mark_sheet = None
+    st.session_state['file_processed'] = True
+    st.session_state['upload_id'] = uploaded_file.file_id
+    st.session_state['batch_mode'] = batch_mode
+
 # Display content only if file is processed
 if st.session_state.get('file_processed', False):
-    df = st.session_state['df']
-    name_col = st.session_state['name_col']
-    question_cols = st.session_state['question_cols']
-
-    # Define function to save chart to buffer
-    def save_chart_to_buffer(fig):
-        buf = BytesIO()
-        fig.savefig(buf, format="png")
-        buf.seek(0)
-        return buf
+    dataset = datasets.view(st.session_state['dataset_key'])
+    if dataset is None:
+        st.session_state['file_processed'] = False
+        st.error("The uploaded data is no longer in memory. Please upload the file again.")
+        st.stop()
+    df = dataset.df
+    name_col = dataset.name_col
+    question_cols = dataset.question_cols
+
+    # In batch mode the frame holds every class; optionally narrow it to one
+    class_table = None
+    selected_class = None
+    if CLASS_COL in df.columns:
+        classes = df[CLASS_COL].cat.categories.tolist()
+        selected_class = st.sidebar.selectbox("Class", ["All classes"] + classes, index=0)
+        if selected_class != "All classes":
+            df = df[df[CLASS_COL] == selected_class].reset_index(drop=True)
+        with timings.span("class summary"):
+            class_table = format_class_summary(class_summary(df))
+
+    # Corrections after moderation are made here instead of in the workbook; each
+    # one publishes a new version of the dataset and reruns with it
+    st.subheader("✏️ Correct Marks")
+    if st.toggle("Edit marks", value=False, key="edit_marks"):
+        full_df = dataset.df
+        editable = np.flatnonzero(full_df[CLASS_COL] == selected_class) if df is not full_df else np.arange(len(full_df))
+        n_edit_pages = -(-len(editable) // charts.LEARNERS_PER_PAGE)
+        edit_page = st.number_input(f"Learner page (of {n_edit_pages})", min_value=1, max_value=n_edit_pages,
+                                    value=1, step=1, key="edit_page") if n_edit_pages > 1 else 1
+        rows = editable[(edit_page - 1) * charts.LEARNERS_PER_PAGE:edit_page * charts.LEARNERS_PER_PAGE]
+        # Float columns, so half marks can be entered for questions stored as whole marks
+        grid = full_df.iloc[rows][[name_col] + question_cols].astype({q: float for q in question_cols})
+        # Pending edits belong to these learners: a keyed editor keeps them while its shape is unchanged,
+        # so the key names the upload (not its corrected versions), the class and the page
+        upload_key = mark_sheet.base_key if mark_sheet is not None else st.session_state['dataset_key']
+        edited = st.data_editor(
+            grid.reset_index(drop=True), key=f"marks_editor_{upload_key}_{selected_class}_{edit_page}",
+            hide_index=True, disabled=[name_col],
+            column_config={q: st.column_config.NumberColumn(min_value=0.0, step=0.5) for q in question_cols})
+        changes = diff_marks(full_df, question_cols, rows, edited)
+        if changes:
+            with timings.span("apply corrections", marks=len(changes)):
+                if mark_sheet is None:
+                    mark_sheet = st.session_state['mark_sheet'] = MarkSheet(datasets.get(st.session_state['dataset_key']))
+                mark_sheet.apply(changes)
+            st.session_state['dataset_key'] = mark_sheet.key
+            st.rerun()
+        if mark_sheet is not None:
+            st.caption(f"Marks corrected in this session: {mark_sheet.corrections}. They are kept while the app is open "
+                       "and included in the report; uploading a file again starts from its marks.")
 
     # Learner Overview
     st.markdown(f'<a name="overview"></a>', unsafe_allow_html=True)
     st.subheader("Results DASHBOARD")
+
+    if class_table is not None:
+        st.subheader("🏫 Class Summary")
+        st.table(class_table)
     
+    # Rendered charts are cached on fingerprints of the columns they read; after
+    # corrections the mark sheet keeps them, the question means and the tiers current
+    sheet = mark_sheet if mark_sheet is not None and df is dataset.df else None
+    hashes = dict(sheet.hashes) if sheet is not None else charts.column_hashes(df)
+    fingerprint = charts.data_fingerprint(df, hashes)
+
+    def show_chart(kind, container=st, data=None, **params):
+        # ``data`` is a page of learners; charts of the whole frame reuse its column fingerprints
+        data = df if data is None else data
+        with timings.span(f"chart: {kind}", backend=chart_backend, learners=len(data)):
+            if chart_backend == "Interactive":
+                fig = interactive.draw_chart(kind, data, **params)
+                container.plotly_chart(fig, width="stretch", key=f"chart-{kind}-{params.get('question')}")
+            else:
+                png = charts.chart_png(kind, data, hashes=hashes if data is df else None,
+                                       session=timings.session, **params)
+                container.image(png, width="stretch")
+
+    # Large classes get class-level summaries, and individual learners a page at a time
+    learner_df = df
+    if charts.is_large_class(df):
+        st.info(f"{len(df)} learners: showing class-level summaries. "
+                f"Individual learners are shown {charts.LEARNERS_PER_PAGE} at a time below.")
+        st.subheader("📊 Percentage Distribution")
+        show_chart('percentage_histogram')
+        st.subheader(f"📊 Top and Bottom {charts.EXTREMES_N} Learners")
+        show_chart('extremes', name_col=name_col)
+        st.subheader("📊 Average Marks by Performance Band")
+        show_chart('heatmap', question_cols=question_cols)
+
+        st.subheader("👥 Individual Learners")
+        n_learner_pages = -(-len(df) // charts.LEARNERS_PER_PAGE)
+        learner_page = st.number_input(f"Learner page (of {n_learner_pages})", min_value=1,
+                                       max_value=n_learner_pages, value=1, step=1, key="learner_page")
+        learner_df = charts.learner_page(df, learner_page)
+        st.caption(f"Learners {(learner_page - 1) * charts.LEARNERS_PER_PAGE + 1}–"
+                   f"{(learner_page - 1) * charts.LEARNERS_PER_PAGE + len(learner_df)} of {len(df)}")
+
     st.subheader("📊 Average Percentage per Learner")
-    avg_fig, ax1 = plt.subplots(figsize=(8, max(5, len(df) * 0.3)))
-    bars = ax1.barh(df[name_col], df['Percentage'], color=sns.color_palette("Blues_d", len(df)))
-    for bar in bars:
-        bar.set_edgecolor('#003366')
-        bar.set_linewidth(1)
-    ax1.set_title("Percentage per Learner", color='#003366', pad=20)
-    ax1.set_xlabel("Percentage (%)")
-    ax1.set_ylabel("Learner")
-    ax1.invert_yaxis()
-    ax1.grid(True, axis='x', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    st.pyplot(avg_fig)
+    show_chart('percentage', data=learner_df, name_col=name_col)
 
     st.subheader("📊 Total Marks per Learner")
-    if selected_chart == "Vertical Bar":
-        total_fig, ax1 = plt.subplots(figsize=(10, 6))
-        sns.barplot(x=df[name_col], y=df['Total'], ax=ax1, palette="Blues_d")
-        ax1.set_title("Total Marks per Learner", color='#003366', pad=20)
-        ax1.set_xlabel("Learner")
-        ax1.set_ylabel("Total Marks")
-        ax1.set_xticklabels(ax1.get_xticklabels(), rotation=90, ha='center')
-        ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        st.pyplot(total_fig)
-    elif selected_chart == "Scatter Plot":
-        total_fig, ax1 = plt.subplots(figsize=(10, 6))
-        ax1.scatter(df[name_col], df['Total'], color='#003366', edgecolor='black', s=100)
-        ax1.set_title("Total Marks per Learner", color='#003366', pad=20)
-        ax1.set_xlabel("Learner")
-        ax1.set_ylabel("Total Marks")
-        ax1.set_xticklabels(df[name_col], rotation=60, ha='right')
-        ax1.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        st.pyplot(total_fig)
-    elif selected_chart == "Box Plot":
-        total_fig, ax1 = plt.subplots(figsize=(10, 6))
-        sns.boxplot(y=df['Total'], ax=ax1, color='#003366', boxprops=dict(edgecolor='black'))
-        ax1.set_title("Distribution of Total Marks", color='#003366', pad=20)
-        ax1.set_ylabel("Total Marks")
-        ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        st.pyplot(total_fig)
+    show_chart('total', data=learner_df, name_col=name_col, chart_type=selected_chart)
 
     # Stacked Bar Chart with Adjusted Names
+    # Heavy sections are only drawn once the user asks for them
     st.subheader("📊 Marks Breakdown by Learner and Question")
-    stacked_fig, ax = plt.subplots(figsize=(10, 6))
-    df.set_index(name_col)[question_cols].plot(kind='bar', stacked=True, ax=ax, colormap="Paired")
-    ax.set_title("Marks Breakdown by Learner and Question", color='#003366', pad=20)
-    ax.set_xlabel("Learner")
-    ax.set_ylabel("Marks")
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=90, ha='center')
-    ax.legend(title="Questions", bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    st.pyplot(stacked_fig)
+    if st.toggle("Show marks breakdown", value=False, key="show_breakdown"):
+        show_chart('breakdown', data=learner_df, name_col=name_col, question_cols=question_cols)
 
     # Question Analysis
     st.markdown(f'<a name="charts"></a>', unsafe_allow_html=True)
     st.subheader("📊 Question Analysis")
-    active_questions = [q for q in question_cols if df[q].sum() > 0]
+    with timings.span("insights"):
+        if sheet is not None:
+            insights = analyse(df, name_col, question_cols, means=sheet.means, tiers=sheet.tiers)
+        else:
+            insights = analyse(df, name_col, question_cols)
+    active_questions = insights.active_questions
+    items = None
     
     if active_questions:
         st.subheader("Average Marks per Question")
-        q_avg_fig, ax_q = plt.subplots(figsize=(8, 5))
-        active_means = df[active_questions].mean()
-        sns.barplot(x=active_means.index, y=active_means.values, ax=ax_q, palette="Greens_d")
-        ax_q.set_title("Average Marks per Question", color='#003366')
-        ax_q.set_xlabel("Question")
-        ax_q.set_ylabel("Average Mark")
-        ax_q.set_xticklabels(ax_q.get_xticklabels(), rotation=45, ha='right')
-        st.pyplot(q_avg_fig)
+        show_chart('question_averages', means=insights.active_means)
 
         st.subheader("Distribution per Question")
-        for question in active_questions:
-            pie_fig, ax2 = plt.subplots(figsize=(6, 6))
-            question_data = df[question].value_counts()
-            total = question_data.sum()
-            percentages = [(count / total * 100) for count in question_data]
-            wedges, texts, autotexts = ax2.pie(
-                question_data,
-                startangle=90,
-                colors=sns.color_palette("Set2", len(question_data)),
-                autopct='%1.1f%%',
-                pctdistance=0.85,
-                wedgeprops={'edgecolor': 'white', 'linewidth': 1}
-            )
-            ax2.axis('equal')
-            ax2.set_title(f"Distribution of Marks for {question}", color='#003366', pad=20)
-            for autotext in autotexts:
-                autotext.set_color('white')
-                autotext.set_fontsize(10)
-                autotext.set_weight('bold')
-            ax2.legend(
-                labels=[f"{mark}: {pct:.1f}%" for mark, pct in zip(question_data.index, percentages)],
-                title="Marks (Percentage)",
-                loc="center left",
-                bbox_to_anchor=(1, 0, 0.5, 1)
-            )
-            plt.tight_layout()
-            st.pyplot(pie_fig)
+        if st.toggle("Show distribution per question", value=False, key="show_distributions"):
+            n_pages = -(-len(active_questions) // PIES_PER_PAGE)
+            page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1) if n_pages > 1 else 1
+            page_questions = active_questions[(page - 1) * PIES_PER_PAGE:page * PIES_PER_PAGE]
+            pie_cols = st.columns(2)
+            for i, question in enumerate(page_questions):
+                show_chart('distribution', container=pie_cols[i % 2], question=question)
+
+        st.subheader("🔬 Item Analysis")
+        with timings.span("item analysis"):
+            items = item_analysis(df, active_questions)
+        st.markdown(f"Cronbach's alpha is **{items.alpha:.2f}** ({alpha_rating(items.alpha)} reliability) "
+                    f"over {items.learners} learners and {len(items.items)} questions.{items.note}")
+        st.dataframe(items.items.style.format(precision=2, na_rep="–"), width="stretch")
+        st.caption("Facility is the average mark as a share of the question's maximum (the highest mark obtained). "
+                   "Discrimination compares the top and bottom 27% of learners; values below 0.2 separate them poorly. "
+                   "Item-rest r correlates the question with the rest of the test, and Alpha if Deleted shows the "
+                   "reliability without it.")
     else:
         st.write("No questions have marks entered yet.")
 
     # Improved Insights and Recommendations with Table
     st.markdown(f'<a name="recommendations"></a>', unsafe_allow_html=True)
     st.subheader("📝 Insights and Recommendations")
-    
-    insights = []
-    recommendations = []
-    learner_performance = {"Needs Improvement": [], "Average": [], "Excelling": []}
-
-    avg_percentage = df['Percentage'].mean()
-    insights.append(f"The class average percentage is **{avg_percentage:.2f}%**.")
-
-    if active_questions:
-        active_means = df[active_questions].mean()
-        avg_question_mean = active_means.mean()
-        weak_questions = active_means[active_means < avg_question_mean * 0.7].index.tolist()
-        if weak_questions:
-            insights.append(f"Weak questions (below 70% of mean {avg_question_mean:.1f}): **{', '.join(weak_questions)}**.")
-
-        # Per-Learner Analysis with Tiered Summary
-        for learner in df[name_col]:
-            learner_data = df[df[name_col] == learner]
-            percentage = learner_data['Percentage'].iloc[0]
-            good_questions = [q for q in active_questions if learner_data[q].iloc[0] > active_means[q]]
-            bad_questions = [q for q in active_questions if learner_data[q].iloc[0] < active_means[q]]
-            
-            if percentage < 30:
-                tier = "Needs Improvement"
-            elif percentage < 70:
-                tier = "Average"
-            else:
-                tier = "Excelling"
-            
-            learner_performance[tier].append({
-                "Learner": learner,
-                "Percentage": f"{percentage:.1f}%",
-                "Strong Questions": ', '.join(good_questions) or "None",
-                "Weak Questions": ', '.join(bad_questions) or "None"
-            })
 
     # Insights as Tables
     st.markdown("### Insights")
-    st.markdown(f"- The class average percentage is {avg_percentage:.2f}%.")
-    if active_questions and weak_questions:
-        st.markdown(f"- Weak questions (below 70% of mean {avg_question_mean:.1f}): {', '.join(weak_questions)}.")
+    st.markdown(f"- The class average percentage is {insights.avg_percentage:.2f}%.")
+    if active_questions and insights.weak_questions:
+        st.markdown(f"- Weak questions (below 70% of mean {insights.avg_question_mean:.1f}): {', '.join(insights.weak_questions)}.")
 
-    for tier, learners in learner_performance.items():
-        if learners:
+    for tier, learners in insights.learner_performance.items():
+        if not learners.empty:
             st.markdown(f"#### {tier} ({len(learners)} learners)")
-            st.table(pd.DataFrame(learners))
+            with timings.span("tier tables"):
+                st.table(learners)
 
     # Recommendations
-    recommendations.append("### Recommendations")
-    if learner_performance["Needs Improvement"]:
-        recommendations.append("- Organize remedial sessions for 'Needs Improvement' learners.")
-    if learner_performance["Excelling"]:
-        recommendations.append("- Provide advanced challenges for 'Excelling' learners.")
-    if active_questions:
-        weakest_question = active_means.idxmin()
-        strongest_question = active_means.idxmax()
-        recommendations.append(f"- Focus class revision on **{weakest_question}** (lowest average: {active_means[weakest_question]:.1f}).")
-        recommendations.append(f"- Note strong performance in **{strongest_question}** (highest average: {active_means[strongest_question]:.1f}).")
-
-    for recommendation in recommendations:
+    for recommendation in insights.recommendations:
         st.markdown(recommendation)
 
     # Download Full Report
     st.markdown(f'<a name="download"></a>', unsafe_allow_html=True)
-    st.subheader("📥 Download Full Report (Word Document)")
-    if st.button("Download Full Report"):
-        doc = Document()
-
-        # Title Page
-        doc.add_heading('Learner Performance Report', 0).alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph('Saul Damon High School', style='Subtitle').alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph('Generated on April 06, 2025', style='Subtitle').alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_page_break()
-
-        # Performance Overview
-        doc.add_heading('Performance Overview', level=1)
-        doc.add_picture(save_chart_to_buffer(avg_fig), width=Inches(5.5))
-        doc.add_paragraph("Figure 1: Average Percentage per Learner", style='Caption')
-        doc.add_picture(save_chart_to_buffer(total_fig), width=Inches(5.5))
-        doc.add_paragraph(f"Figure 2: Total Marks per Learner ({selected_chart})", style='Caption')
-        doc.add_picture(save_chart_to_buffer(stacked_fig), width=Inches(5.5))
-        doc.add_paragraph("Figure 3: Marks Breakdown by Learner and Question", style='Caption')
-
-        # Question Analysis
-        doc.add_heading('Question Analysis', level=1)
-        if active_questions:
-            doc.add_picture(save_chart_to_buffer(q_avg_fig), width=Inches(5.5))
-            doc.add_paragraph("Figure 4: Average Marks per Question", style='Caption')
-            for i, question in enumerate(active_questions, 5):
-                pie_fig, _ = plt.subplots(figsize=(6, 6))
-                question_data = df[question].value_counts()
-                total = question_data.sum()
-                percentages = [(count / total * 100) for count in question_data]
-                plt.pie(
-                    question_data,
-                    startangle=90,
-                    colors=sns.color_palette("Set2", len(question_data)),
-                    autopct='%1.1f%%',
-                    pctdistance=0.85,
-                    wedgeprops={'edgecolor': 'white', 'linewidth': 1}
-                )
-                plt.title(f"Distribution of Marks for {question}", color='#003366', pad=20)
-                plt.legend(
-                    labels=[f"{mark}: {pct:.1f}%" for mark, pct in zip(question_data.index, percentages)],
-                    title="Marks (Percentage)",
-                    loc="center left",
-                    bbox_to_anchor=(1, 0, 0.5, 1)
-                )
-                plt.axis('equal')
-                plt.tight_layout()
-                doc.add_picture(save_chart_to_buffer(pie_fig), width=Inches(5.5))
-                doc.add_paragraph(f"Figure {i}: Distribution of Marks for {question}", style='Caption')
-
-        # Insights and Recommendations
-        doc.add_heading('Insights and Recommendations', level=1)
-        doc.add_paragraph("Insights", style='Heading 2')
-        doc.add_paragraph(f"The class average percentage is {avg_percentage:.2f}%.", style='List Bullet')
-        if active_questions and weak_questions:
-            doc.add_paragraph(f"Weak questions (below 70% of mean {avg_question_mean:.1f}): {', '.join(weak_questions)}.", style='List Bullet')
-
-        for tier, learners in learner_performance.items():
-            if learners:
-                doc.add_paragraph(f"{tier} ({len(learners)} learners)", style='Heading 3')
-                table = doc.add_table(rows=len(learners) + 1, cols=4)
-                table.style = 'Table Grid'
-                hdr_cells = table.rows[0].cells
-                hdr_cells[0].text = 'Learner'
-                hdr_cells[1].text = 'Percentage'
-                hdr_cells[2].text = 'Strong Questions'
-                hdr_cells[3].text = 'Weak Questions'
-                for i, learner in enumerate(learners, 1):
-                    row_cells = table.rows[i].cells
-                    row_cells[0].text = learner['Learner']
-                    row_cells[1].text = learner['Percentage']
-                    row_cells[2].text = learner['Strong Questions']
-                    row_cells[3].text = learner['Weak Questions']
-                for row in table.rows:
-                    for cell in row.cells:
-                        cell.paragraphs[0].runs[0].font.size = Pt(10)
-
-        doc.add_paragraph("Recommendations", style='Heading 2')
-        for recommendation in recommendations:
-            if recommendation.startswith("###"):
-                doc.add_paragraph(recommendation.replace("### ", ""), style='Heading 3')
-            else:
-                doc.add_paragraph(recommendation.replace('**', ''), style='List Bullet')
-
-        # Save and Download
-        doc_stream = BytesIO()
-        doc.save(doc_stream)
-        doc_stream.seek(0)
+    st.subheader("📥 Download Full Report")
+    report_format = st.radio("Format", list(REPORT_FORMATS), horizontal=True, key="report_format",
+                             help="Learner reports are a zip with a one-page PDF for every learner in the class.")
+    file_name, mime = REPORT_FORMATS[report_format]
+    if report_format != "Learner reports":
+        image_quality = st.radio("Chart image quality", list(IMAGE_QUALITY), horizontal=True,
+                                 help="Compact embeds smaller chart images for a lighter file.")
+        settings = (selected_chart, image_quality)
+    else:
+        settings = ()  # Learner pages draw their own charts
+    # Reports are built in the background and cached on the data and settings
+    report_key = (fingerprint, report_format, *settings, date.today())
+    report_job = report_jobs.job(report_key)
+    if report_job is not None and report_job.error() is not None:
+        st.error(f"Report generation failed: {report_job.error()}")
+        report_jobs.discard(report_key)
+        report_job = None
+    if report_job is not None:
+        @st.fragment(run_every=1.0)
+        def report_progress():
+            if report_job.done():
+                st.rerun()
+            st.progress(report_job.fraction, text=f"Building report: {report_job.section}")
+        report_progress()
+    elif (report := report_jobs.result(report_key)) is not None:
         st.download_button(
-            label="Download Full Report (Word Document)",
-            data=doc_stream,
-            file_name="learner_performance_report.docx",
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            label=f"Download Full Report ({report_format})",
+            data=report,
+            file_name=file_name,
+            mime=mime
         )
+    elif st.button("Generate Full Report"):
+        if report_format == "Learner reports":
+            # The whole dataset's cube is shared with the analysis page; a single class gets its own
+            cube = stats_cube(st.session_state['dataset_key'], dataset) if df is dataset.df else build_cube(df, name_col, question_cols)
+            report_jobs.submit(report_key, learner_reports_zip, cube, session=timings.session)
+        else:
+            report_jobs.submit(
+                report_key, render_report,
+                df, name_col, question_cols, selected_chart,
+                insights=insights,
+                items=items,
+                hashes=hashes,
+                class_table=class_table if class_table is not None else pd.DataFrame(),
+                image_quality=image_quality,
+                builder=build_class_pdf if report_format == "PDF" else build_report,
+                session=timings.session
+            )
+        st.rerun()
 
 # Footer
-st.markdown(f'<div class="footer">Designed by Mr AR Visagie</div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(f'<div class="footer">Designed by Mr AR Visagie</div>', unsafe_allow_html=True)
+sidebar_panel(timings)
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Memory regression check for the dashboard script.
+
+Runs app.py headlessly many times against the sample workbook, forcing every
+chart to be redrawn on each run, and fails if resident memory keeps growing
+or pyplot is left holding figures::
+
+    python benchmarks/memory_growth.py --runs 40 --max-growth-mb 40
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# Draw charts in this process: app.py starts the shared worker pool, and growth
+# in its child processes would go unmeasured
+os.environ["TERMREPORT_WORKERS"] = "0"
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from streamlit.testing.v1 import AppTest
+
+from termreport import charts
+from termreport.ingest import load_assessment
+
+SAMPLE = ROOT / "PUNT PER VRAAG ANALISE.xlsx"
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak rather than current RSS, but still catches unbounded growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seeded_app(workbook):
+    assessment = load_assessment(workbook)
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=300)
+    at.session_state['dataset_key'] = assessment.key
+    at.session_state['file_processed'] = True
+    # Exercise the server-side matplotlib path with every section drawn
+    at.session_state['chart_backend'] = "Static images"
+    at.session_state['show_breakdown'] = True
+    at.session_state['show_distributions'] = True
+    return at
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workbook", nargs="?", default=SAMPLE)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--max-growth-mb", type=float, default=40.0)
+    args = parser.parse_args(argv)
+
+    at = seeded_app(args.workbook)
+    baseline = None
+    for i in range(args.runs):
+        charts.chart_cache.clear()
+        at.run()
+        if at.exception:
+            print(at.exception[0].message, file=sys.stderr)
+            return 2
+        gc.collect()
+        if i + 1 == args.warmup:
+            baseline = rss_mb()
+    final = rss_mb()
+    growth = final - baseline
+    open_figures = len(plt.get_fignums())
+
+    print(f"runs={args.runs} rss_after_warmup={baseline:.1f}MB rss_final={final:.1f}MB "
+          f"growth={growth:.1f}MB open_pyplot_figures={open_figures}")
+    if open_figures:
+        print("FAIL: pyplot still holds figures", file=sys.stderr)
+        return 1
+    if growth > args.max_growth_mb:
+        print(f"FAIL: RSS grew by more than {args.max_growth_mb}MB", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
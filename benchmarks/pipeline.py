@@ -0,0 +1,198 @@
+"""Benchmark of the parse -> analyse -> render -> export pipeline.
+
+Generates synthetic workbooks in the "PUNT PER VRAAG ANALISE.xlsx" template
+shape, then times each stage separately without a Streamlit server:
+
+* ingest      - reading and parsing the workbook (caches bypassed)
+* totals      - Total/Percentage computation
+* insights    - question means, learner tiers and strong/weak questions
+* render      - drawing every static chart of the dashboard to PNG (on
+                worker processes with --workers)
+* export      - assembling the Word report from the rendered charts
+
+Results (seconds, peak RSS and, with --trace-memory, per-stage Python peak
+allocations) are written as JSON so runs can be compared::
+
+    python benchmarks/pipeline.py --output bench.json
+    python benchmarks/pipeline.py --learners 30 300 --questions 10 60 --baseline bench.json
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from termreport import archive, charts, ingest
+from termreport.insights import analyse
+from termreport.report import render_report
+from termreport.store import datasets
+from termreport.workers import pool
+
+STAGES = ["ingest", "totals", "insights", "render", "export"]
+DEFAULT_LEARNERS = [30, 300, 1500, 5000]
+DEFAULT_QUESTIONS = [10, 60, 200]
+
+
+def make_workbook(path, learners, questions, seed=0):
+    """Write a template-shaped workbook with random marks (0-10 per question)."""
+    rng = np.random.default_rng(seed)
+    marks = rng.integers(0, 11, size=(learners, questions))
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    for row in [
+        ["SAUL DAMON HIGH SCHOOL"],
+        ["PUNT-PER-VRAAG ANALISE"],
+        ["OPVOEDER:", "BENCHMARK"],
+        ["GRAAD:", 11],
+        ["VAK:", "TEGNIESE WETENSKAPPE"],
+        ["SBA-STUK", "SYNTHETIC TOETS"],
+        ["KWARTAAL:", 1],
+        ["TOTAAL:", questions * 10],
+        [],
+        ["NAME OF LEARNER"] + [f"QUESTION {i + 1}" for i in range(questions)],
+    ]:
+        ws.append(row)
+    for i in range(learners):
+        ws.append([f"LEARNER {i:05d}, Synthetic"] + marks[i].tolist())
+    wb.save(path)
+
+
+def peak_rss_mb():
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_stage(name, func, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    result = None
+    try:
+        result = func()
+    except Exception as e:  # Record the failure and keep benchmarking the other stages
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    record = {"stage": name, "seconds": round(seconds, 4), "peak_rss_mb": round(peak_rss_mb(), 1), "error": error}
+    if trace_memory:
+        record["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return record, result
+
+
+def benchmark(path, learners, questions, stages, trace_memory):
+    records = []
+    datasets.clear()
+    charts.chart_cache.clear()
+
+    def stage(name, func):
+        if name not in stages:
+            return None
+        record, result = run_stage(name, func, trace_memory)
+        records.append({"learners": learners, "questions": questions, **record})
+        return result
+
+    assessment = stage("ingest", lambda: ingest.load_assessment(path))
+    if assessment is None:
+        return records
+    df, name_col, question_cols = assessment.df, assessment.name_col, assessment.question_cols
+
+    stage("totals", lambda: ingest.add_totals(df.copy(), question_cols, assessment.max_possible))
+    insights = stage("insights", lambda: analyse(df, name_col, question_cols)) or analyse(df, name_col, question_cols)
+    hashes = charts.column_hashes(df)
+
+    def render():
+        # What the dashboard draws: class summaries plus the first page of learners for large classes
+        futures = []
+        learners_df = df
+        if charts.is_large_class(df):
+            for kind in charts.AGGREGATE_KINDS:
+                futures.append(charts.submit_png(kind, df, name_col, question_cols, hashes=hashes))
+            learners_df = charts.learner_page(df, 1)
+        for kind in ["percentage", "total", "breakdown"]:
+            futures.append(charts.submit_png(kind, learners_df, name_col, question_cols,
+                                             chart_type=charts.CHART_OPTIONS[0],
+                                             hashes=hashes if learners_df is df else None))
+        if insights.active_questions:
+            futures.append(charts.submit_png("question_averages", df, means=insights.active_means,
+                                             hashes=hashes))
+            for question in insights.active_questions:
+                futures.append(charts.submit_png("distribution", df, question=question, hashes=hashes))
+        for future in futures:
+            future.result()
+
+    stage("render", render)
+    stage("export", lambda: render_report(df, name_col, question_cols, insights=insights, hashes=hashes))
+    return records
+
+
+def print_table(records, baseline=None):
+    previous = {}
+    for record in baseline or []:
+        previous[(record["learners"], record["questions"], record["stage"])] = record["seconds"]
+    print(f"{'learners':>8} {'questions':>9} {'stage':<9} {'seconds':>9} {'rss MB':>8}  note")
+    for r in records:
+        note = r["error"] or ""
+        before = previous.get((r["learners"], r["questions"], r["stage"]))
+        if before and not r["error"]:
+            note = f"{r['seconds'] / before:.2f}x baseline"
+        print(f"{r['learners']:>8} {r['questions']:>9} {r['stage']:<9} {r['seconds']:>9.3f} {r['peak_rss_mb']:>8.1f}  {note}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parse/analyse/render/export pipeline on synthetic workbooks.")
+    parser.add_argument("--learners", type=int, nargs="+", default=DEFAULT_LEARNERS)
+    parser.add_argument("--questions", type=int, nargs="+", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--trace-memory", action="store_true", help="record per-stage Python peak allocations (slows every stage)")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="render and export on a pool of this many worker processes (0: in this process)")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        pool.workers = args.workers
+        pool.start()
+
+    archive.CACHE_DIR = ""  # Always measure a real parse
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for learners in args.learners:
+            for questions in args.questions:
+                path = Path(tmp) / f"bench_{learners}x{questions}.xlsx"
+                make_workbook(path, learners, questions)
+                records.extend(benchmark(path, learners, questions, args.stages, args.trace_memory))
+
+    baseline = json.loads(Path(args.baseline).read_text())["results"] if args.baseline else None
+    print_table(records, baseline)
+    meta = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "trace_memory": args.trace_memory,
+        "workers": args.workers,
+    }
+    Path(args.output).write_text(json.dumps({"meta": meta, "results": records}, indent=2))
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Benchmark of the streaming template reader against the pandas path.
+
+Compares ``ingest.read_template`` with ``ingest.parse_sheet(pd.read_excel(...))``
+on synthetic template workbooks, plain and "heavily styled": every learner
+row styled out to a wide column range and thousands of formatted empty rows
+below the learner block, as teachers' workbooks often are. Both paths are
+checked to give the same frame before timing::
+
+    python benchmarks/reader.py
+    python benchmarks/reader.py --learners 40 400 4000 --questions 20 --styled-rows 20000 --output reader.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Border, PatternFill, Side
+
+from termreport import ingest
+
+DEFAULT_LEARNERS = [40, 400, 4000]
+DEFAULT_QUESTIONS = [10, 60]
+
+
+def make_workbook(path, learners, questions, styled_rows=0, styled_cols=0, seed=0):
+    """Write a template workbook; ``styled_rows``/``styled_cols`` add formatted empty cells.
+
+    Written in normal (not write-only) mode so the sheet carries a
+    ``<dimension>`` element, as workbooks saved by Excel do.
+    """
+    rng = np.random.default_rng(seed)
+    marks = rng.integers(0, 11, size=(learners, questions))
+    wb = Workbook()
+    ws = wb.active
+    fill = PatternFill("solid", fgColor="FFF2CC")
+    border = Border(*(Side(style="thin"),) * 4)
+    for row in [["SAUL DAMON HIGH SCHOOL"], ["OPVOEDER:", "BENCHMARK"], ["TOTAAL:", questions * 10], []]:
+        ws.append(row)
+    ws.append(["NAME OF LEARNER"] + [f"QUESTION {i + 1}" for i in range(questions)])
+    for i in range(learners):
+        ws.append([f"LEARNER {i:05d}, Synthetic"] + marks[i].tolist())
+    first_styled_col = questions + 2
+    for row in ws.iter_rows(min_row=6, max_row=5 + learners + styled_rows,
+                            min_col=1 if styled_rows else first_styled_col,
+                            max_col=first_styled_col + styled_cols - 1):
+        for cell in row:
+            if cell.row > 5 + learners or cell.column >= first_styled_col:
+                cell.fill, cell.border = fill, border
+    wb.save(path)
+
+
+def pandas_path(data):
+    return ingest.parse_sheet(pd.read_excel(BytesIO(data), sheet_name=0, header=None))
+
+
+def streaming_path(data):
+    return ingest.read_template(data)
+
+
+def best_of(func, data, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the streaming template reader with pd.read_excel.")
+    parser.add_argument("--learners", type=int, nargs="+", default=DEFAULT_LEARNERS)
+    parser.add_argument("--questions", type=int, nargs="+", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--styled-rows", type=int, default=5000, help="formatted empty rows below the learner block")
+    parser.add_argument("--styled-cols", type=int, default=40, help="formatted empty cells right of each learner row")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="optional JSON file for the results")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'learners':>8} {'questions':>9} {'layout':<7} {'MB':>6} {'pandas s':>9} {'stream s':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for learners in args.learners:
+            for questions in args.questions:
+                for layout, rows, cols in [("plain", 0, 0), ("styled", args.styled_rows, args.styled_cols)]:
+                    path = Path(tmp) / f"{layout}_{learners}x{questions}.xlsx"
+                    make_workbook(path, learners, questions, rows, cols)
+                    data = path.read_bytes()
+                    pd.testing.assert_frame_equal(pandas_path(data).df, streaming_path(data).df)
+                    pandas_best, _ = best_of(pandas_path, data, args.repeat)
+                    stream_best, _ = best_of(streaming_path, data, args.repeat)
+                    results.append({"learners": learners, "questions": questions, "layout": layout,
+                                    "bytes": len(data), "pandas_s": round(pandas_best, 4),
+                                    "streaming_s": round(stream_best, 4)})
+                    print(f"{learners:>8} {questions:>9} {layout:<7} {len(data) / 2**20:>6.2f} "
+                          f"{pandas_best:>9.3f} {stream_best:>9.3f} {pandas_best / stream_best:>7.1f}x")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
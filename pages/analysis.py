@@ -1,8 +1,19 @@
+from pathlib import Path
+
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import seaborn as sns
 import matplotlib.pyplot as plt
+from termreport.cube import stats_cube
+from termreport.compare import common_questions, group_summary, question_stats, stack_groups
+from termreport.ingest import CLASS_COL, TemplateError, load_assessment, load_assessments
+from termreport.insights import TIERS
+from termreport.longitudinal import ProgressHistory
+from termreport.roster import RESULTS_PER_PAGE, n_pages, result_page
+from termreport.store import datasets
+from termreport.admin import begin_rerun, sidebar_panel
+
+timings = begin_rerun()
 
 # Inject favicon
 st.markdown(
@@ -27,28 +38,19 @@ if not st.session_state.get('file_processed', False):
     st.error("Please upload an Excel file on the Home page first.")
     st.stop()
 
-# Retrieve data
-df = st.session_state['df']
-name_col = st.session_state['name_col']
-
-# Re-filter question_cols to ensure only active questions are included
-all_question_cols = [col for col in df.columns if df[col].dtype in ['int64', 'float64'] and col not in ['Total', 'Percentage']]
-question_cols = [col for col in all_question_cols if df[col].sum() > 0]  # Only questions with non-zero sums
-
-# Ensure Total and Percentage are calculated based on active questions only
-if 'Total' not in df.columns or 'Percentage' not in df.columns:
-    uploaded_file = st.session_state['uploaded_file']
-    df_raw = pd.read_excel(uploaded_file, header=None)
-    total_row = next((i for i, row in df_raw.iterrows() if any("totaal:" in str(cell).lower() for cell in row)), None)
-    if total_row is not None:
-        total_value = df_raw.iloc[total_row].apply(str).str.extract(r'(\d+)').dropna().iloc[0, 0]
-        max_possible = int(total_value)
-    else:
-        max_possible = 50
-    df['Total'] = df[question_cols].sum(axis=1)
-    df['Percentage'] = (df['Total'] / max_possible * 100)
-    st.session_state['df'] = df  # Update session state
-    st.session_state['question_cols'] = question_cols  # Update stored question_cols
+# Retrieve a read-only view of the shared dataset
+dataset = datasets.view(st.session_state['dataset_key'])
+if dataset is None:
+    st.session_state['file_processed'] = False
+    st.error("The uploaded data is no longer in memory. Please upload the file again on the Home page.")
+    st.stop()
+df = dataset.df
+name_col = dataset.name_col
+
+# Per-question stats, ranks and learner comparisons are computed once per dataset
+with timings.span("stats cube"):
+    cube = stats_cube(st.session_state['dataset_key'], dataset)
+question_cols = cube.question_cols  # Only questions with non-zero sums
 
 # Create tabs
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -60,44 +62,66 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs([
 ])
 
 # Tab 1: Learner Dashboard
-with tab1:
+with tab1, timings.span("tab: learner dashboard"):
     st.subheader("Individual Learner Dashboard")
     st.markdown("This section shows a selected learner’s strengths and weaknesses compared to the class average.")
-    learner = st.selectbox("Select Learner", df[name_col])
-    learner_data = df[df[name_col] == learner].iloc[0]
-
-    radar_fig = px.line_polar(
-        r=learner_data[question_cols].values,
-        theta=question_cols,
-        line_close=True,
-        title=f"Performance Profile for {learner}"
-    )
-    radar_fig.update_traces(fill='toself', line_color='#003366')
-    st.plotly_chart(radar_fig)
-    st.markdown("**Radar Chart Explanation:** This shows the learner’s marks per active question.")
-
-    avg_class = df[question_cols].mean()
-    comparison_df = pd.DataFrame({
-        "Question": question_cols,
-        "Learner": learner_data[question_cols].values,
-        "Class Average": avg_class.values
-    }).melt(id_vars=["Question"], var_name="Category", value_name="Marks")
-    bar_fig = px.bar(
-        comparison_df,
-        x="Question",
-        y="Marks",
-        color="Category",
-        barmode='group',
-        title=f"{learner} vs. Class Average",
-        color_discrete_map={"Learner": "#003366", "Class Average": "#4CAF50"}
-    )
-    st.plotly_chart(bar_fig)
-    st.markdown("**Bar Chart Explanation:** Compares the learner’s mark to the class average for each active question.")
-    weak_q = learner_data[question_cols].idxmin()
-    st.markdown(f"**Focus Area:** {weak_q} (Score: {learner_data[weak_q]:.1f})")
+    # Indexed search over the roster; only one page of matches is offered at a time
+    roster = cube.roster
+    query = st.text_input("Search learners", placeholder="Name, part of a name or learner number")
+    with st.expander("Filters"):
+        tiers = st.multiselect("Tier", TIERS)
+        classes = st.multiselect("Class", roster.class_names) if roster.classes is not None else None
+        top = max(100.0, float(roster.percentage.max(initial=0)))
+        percentage = st.slider("Percentage", 0.0, top, (0.0, top), step=1.0)
+    matches, fuzzy = roster.search(query, tiers, classes, None if percentage == (0.0, top) else percentage)
+    results = n_pages(matches)
+    results_page = st.number_input(f"Results page (of {results})", min_value=1, max_value=results, value=1,
+                                   step=1) if results > 1 else 1
+    page_positions = result_page(matches, results_page)
+    if fuzzy:
+        st.caption("No exact match; showing close spellings.")
+
+    if len(matches) == 0:
+        st.warning("No learners match the search and filters.")
+    else:
+        st.caption(f"{len(matches)} of {len(roster)} learners match" + (
+            f"; showing {(results_page - 1) * RESULTS_PER_PAGE + 1}–"
+            f"{(results_page - 1) * RESULTS_PER_PAGE + len(page_positions)}" if results > 1 else ""))
+        learner_pos = st.selectbox("Select Learner", page_positions.tolist(),
+                                   format_func=lambda pos: f"{cube.names[pos]} (#{pos + 1})")
+        learner = cube.names[learner_pos]
+        learner_marks = cube.learner_marks(learner_pos)
+
+        radar_fig = px.line_polar(
+            r=learner_marks.values,
+            theta=question_cols,
+            line_close=True,
+            title=f"Performance Profile for {learner}"
+        )
+        radar_fig.update_traces(fill='toself', line_color='#003366')
+        st.plotly_chart(radar_fig)
+        st.markdown("**Radar Chart Explanation:** This shows the learner’s marks per active question.")
+
+        comparison_df = cube.learner_comparison(learner_pos)
+        bar_fig = px.bar(
+            comparison_df,
+            x="Question",
+            y="Marks",
+            color="Category",
+            barmode='group',
+            title=f"{learner} vs. Class Average",
+            color_discrete_map={"Learner": "#003366", "Class Average": "#4CAF50"}
+        )
+        st.plotly_chart(bar_fig)
+        st.markdown("**Bar Chart Explanation:** Compares the learner’s mark to the class average for each active question.")
+        weak_q = learner_marks.idxmin()
+        st.markdown(f"**Focus Area:** {weak_q} (Score: {learner_marks[weak_q]:.1f})")
+        gap_q, gap = cube.largest_gap(learner_pos)
+        st.markdown(f"**Class Rank:** {cube.ranks[learner_pos]} of {len(cube.names)} · "
+                    f"**Furthest below class average:** {gap_q} ({gap:+.1f})")
 
 # Tab 2: Question Analysis
-with tab2:
+with tab2, timings.span("tab: question analysis"):
     st.subheader("Question Performance")
     st.markdown("This section shows performance details for each active question.")
     question = st.selectbox("Select Question", question_cols)
@@ -106,9 +130,8 @@ with tab2:
     st.markdown("**Box Plot Explanation:** Shows spread of marks for the selected question.")
 
     st.markdown("### Top 5 Weakest Questions")
-    avg_scores = df[question_cols].mean().sort_values().head(5)
     weak_fig = px.bar(
-        avg_scores,
+        cube.weakest,
         orientation='v',
         labels={'value': 'Average Score', 'index': 'Question'},
         title="Questions with Lowest Class Averages",
@@ -116,86 +139,122 @@ with tab2:
     )
     st.plotly_chart(weak_fig)
     st.markdown("**Chart Explanation:** The 5 questions with the lowest average scores.")
-    stats = df[question].describe()
     st.markdown(f"**Stats for {question}:**")
-    st.write(stats)
+    st.write(cube.describe.loc[question])
+    mark_counts = cube.value_counts[question]
+    st.markdown(f"**Most common mark:** {mark_counts.idxmax()} ({mark_counts.max()} learners)")
 
 # Tab 3: Progress Tracker
-with tab3:
+with tab3, timings.span("tab: progress tracker"):
     st.subheader("Progress Over Time")
-    st.markdown("Shows how average marks change over time. Requires a 'Test Date' column.")
-    if 'Test Date' in df.columns:
-        df['Test Date'] = pd.to_datetime(df['Test Date'])
-        progress_df = df.groupby('Test Date')[question_cols].mean().reset_index()
-        progress_fig = px.line(progress_df, x='Test Date', y=question_cols, title="Average Marks Over Time")
+    st.markdown("Shows how marks change across assessments. Upload earlier tests in the same template, or use a 'Test Date' column to split one sheet into several tests.")
+    history = st.session_state.setdefault('progress_history', ProgressHistory())
+    # Already-added assessments are skipped; a corrected version replaces its upload's entry
+    mark_sheet = st.session_state.get('mark_sheet')
+    upload_key = mark_sheet.base_key if mark_sheet is not None and mark_sheet.key == dataset.key else None
+    history.add(dataset, label="Current upload", key=upload_key)
+    earlier_files = st.file_uploader("Upload earlier assessments", type=["xlsx"], accept_multiple_files=True)
+    for earlier_file in earlier_files or []:
+        try:
+            history.add(load_assessment(earlier_file), label=Path(earlier_file.name).stem)
+        except TemplateError as e:
+            st.warning(f"{earlier_file.name}: {e}")
+
+    if len(history) < 2:
+        st.warning("Only one assessment is available. Upload earlier tests or add a 'Test Date' column to track progress.")
+    else:
+        progress_df = history.question_trend(question_cols).reset_index()
+        progress_fig = px.line(progress_df, x='Assessment', y=progress_df.columns[1:], markers=True, title="Average Marks Over Time")
         st.plotly_chart(progress_fig)
         st.markdown("**Line Chart Explanation:** Tracks the change in class average for each active question over time.")
-    else:
-        st.warning("Your current Excel file lacks a 'Test Date' column. Add it to track progress.")
+
+        learner_keys = sorted(history.names, key=lambda key: history.names[key])
+        tracked = st.selectbox("Track Learner", learner_keys, format_func=lambda key: history.names[key])
+        learner_progress = history.learner_trend(tracked)
+        learner_fig = px.line(learner_progress, x='Assessment', y='Percentage', markers=True, title=f"{history.names[tracked]}: Percentage Over Time")
+        learner_fig.update_traces(line_color='#003366')
+        st.plotly_chart(learner_fig)
+        question_progress = history.learner_question_trend(tracked, question_cols)
+        if not question_progress.empty:
+            st.markdown(f"**Marks per question for {history.names[tracked]}**")
+            st.dataframe(question_progress)
 
 # Tab 4: Comparative Analysis
-with tab4:
+with tab4, timings.span("tab: comparative analysis"):
     st.subheader("Group Comparison")
-    st.markdown("Upload another file to compare your group’s performance.")
-    additional_file = st.file_uploader("Upload comparison Excel file", type=["xlsx"])
-    if additional_file:
-        df2_raw = pd.read_excel(additional_file, header=None)
-        header_row2 = next((i for i, row in df2_raw.iterrows() if any("name of learner" in str(cell).lower() for cell in row)), None)
-        total_row2 = next((i for i, row in df2_raw.iterrows() if any("totaal:" in str(cell).lower() for cell in row)), None)
-        if header_row2 is not None:
-            df2 = pd.read_excel(additional_file, skiprows=header_row2)
-            df2.columns = df2.columns.str.strip()
-            name_col2 = next((col for col in df2.columns if "name of learner" in col.lower()), None)
-            if name_col2:
-                name_col_idx2 = df2.columns.get_loc(name_col2)
-                all_q2 = [col for col in df2.columns[name_col_idx2 + 1:] if df2[col].dtype in ['int64', 'float64']]
-                df2[all_q2] = df2[all_q2].fillna(0)
-                q2 = [col for col in all_q2 if df2[col].sum() > 0]  # Filter active questions
-                df2['Total'] = df2[q2].sum(axis=1)
-                if total_row2 is not None:
-                    total_value2 = df2_raw.iloc[total_row2].apply(str).str.extract(r'(\d+)').dropna().iloc[0, 0]
-                    max_possible2 = int(total_value2)
-                else:
-                    max_possible2 = 50
-                df2['Percentage'] = (df2['Total'] / max_possible2 * 100)
-                common_q = [q for q in question_cols if q in q2]
-                if common_q:
-                    compare_fig = px.bar(
-                        pd.DataFrame({"Original Group": df[common_q].mean(), "New Group": df2[common_q].mean()}).reset_index().rename(columns={"index": "Question"}),
-                        x="Question",
-                        y=["Original Group", "New Group"],
-                        barmode='group',
-                        title="Average Marks Comparison",
-                        color_discrete_map={"Original Group": "#003366", "New Group": "#4CAF50"}
-                    )
-                    st.plotly_chart(compare_fig)
-                    st.markdown("**Bar Chart Explanation:** Shows how two groups performed on the same active questions.")
-                else:
-                    st.error("No matching active question columns between the two files.")
-            else:
-                st.error("Could not find 'NAME OF LEARNER' in the second file.")
-        else:
-            st.error("Could not locate 'NAME OF LEARNER' row in the second file.")
+    st.markdown("Compare any number of classes or schools question by question. Upload their files below, or pick classes when the Home page is in batch mode.")
+    groups, group_questions = {}, {}
+    if CLASS_COL in df.columns:
+        classes = df[CLASS_COL].cat.categories.tolist()
+        for class_name in st.multiselect("Classes to compare", classes, default=classes):
+            groups[class_name] = df[df[CLASS_COL] == class_name]
+            group_questions[class_name] = question_cols
     else:
+        groups["Current Group"] = df
+        group_questions["Current Group"] = question_cols
+    comparison_files = st.file_uploader("Upload comparison Excel files", type=["xlsx"], accept_multiple_files=True)
+    if comparison_files:
+        with timings.span("compare: parse uploads", files=len(comparison_files)):
+            results = load_assessments(comparison_files, timings.session)
+        for comparison_file, result in zip(comparison_files, results):
+            if isinstance(result, TemplateError):
+                st.error(f"{comparison_file.name}: {result}")
+                continue
+            label = Path(comparison_file.name).stem
+            while label in groups:
+                label += "'"
+            groups[label] = result.df
+            group_questions[label] = result.question_cols
+
+    if len(groups) < 2:
         st.markdown("**Current Group Averages**")
-        st.bar_chart(df[question_cols].mean())
+        st.bar_chart(cube.means)
+    else:
+        common_q = common_questions(groups, group_questions)
+        if common_q:
+            reference = st.selectbox("Reference group for effect sizes", list(groups))
+            stats = question_stats(stack_groups(groups, common_q), common_q, reference)
+            compare_fig = px.bar(
+                stats['Mean'].reset_index(),
+                x="Question",
+                y="Mean",
+                color="Group",
+                barmode='group',
+                title="Average Marks Comparison"
+            )
+            st.plotly_chart(compare_fig)
+            st.markdown("**Bar Chart Explanation:** Shows how the groups performed on the same active questions.")
+            st.markdown("**Group Summary**")
+            st.dataframe(group_summary(groups).style.format(precision=1))
+            st.markdown(f"**Per-Question Statistics** (effect size is Cohen's d against {reference})")
+            st.dataframe(stats.style.format(precision=2))
+        else:
+            st.error("No matching active question columns between the groups.")
 
 # Tab 5: Interactive Insights
-with tab5:
+with tab5, timings.span("tab: interactive insights"):
     st.subheader("Build Your Own Insights")
     st.markdown("Select active questions and a chart type to explore the data.")
     selected_questions = st.multiselect("Select Questions", question_cols, default=question_cols[:2])
     chart_type = st.selectbox("Chart Type", ["Bar", "Scatter", "Histogram"], index=0)
     if selected_questions:
-        if chart_type == "Bar":
-            bar_fig = px.bar(df, x=name_col, y=selected_questions, barmode='group', title="Custom Bar Chart")
+        if chart_type == "Bar" and len(page_positions) == 0:
+            st.info("No learners match the Learner Dashboard search and filters.")
+        elif chart_type == "Bar":
+            # One bar group per learner: limited to the current page of Learner Dashboard results
+            bar_df = df.iloc[page_positions]
+            bar_fig = px.bar(bar_df, x=name_col, y=selected_questions, barmode='group', title="Custom Bar Chart")
             bar_fig.update_layout(xaxis={'tickangle': 90})
             st.plotly_chart(bar_fig)
             st.markdown("**Bar Chart Explanation:** Each learner’s performance for selected active questions.")
+            if len(bar_df) < len(df):
+                st.caption(f"Showing the {len(bar_df)} learners on the current Learner Dashboard results page; "
+                           "search or filter there to choose others.")
         elif chart_type == "Scatter" and len(selected_questions) >= 2:
             scatter_fig = px.scatter(df, x=selected_questions[0], y=selected_questions[1], hover_data=[name_col], title=f"{selected_questions[0]} vs {selected_questions[1]}")
             st.plotly_chart(scatter_fig)
             st.markdown("**Scatter Plot Explanation:** Compares two selected active questions.")
+            st.markdown(f"**Correlation:** r = {cube.correlations.loc[selected_questions[0], selected_questions[1]]:.2f}")
         elif chart_type == "Histogram":
             hist_fig = px.histogram(df, x=selected_questions[0], title=f"Histogram of {selected_questions[0]}")
             st.plotly_chart(hist_fig)
@@ -203,4 +262,5 @@ with tab5:
         else:
             st.warning("Select at least 2 questions for a Scatter plot.")
 
-st.markdown('<div class="footer">Designed by Mr AR Visagie</div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('<div class="footer">Designed by Mr AR Visagie</div>', unsafe_allow_html=True)
+sidebar_panel(timings)
\ No newline at end of file
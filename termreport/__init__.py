@@ -0,0 +1 @@
+"""Shared parsing, analysis and export code for the learner performance dashboard."""
@@ -0,0 +1,61 @@
+"""Admin-only sidebar panel with per-stage latency, cache hit rates, worker pool load and profiling.
+
+The panel is shown when ``TERMREPORT_ADMIN_TOKEN`` is set and the page is
+opened with ``?admin=<token>``; the session stays in admin mode across pages.
+"""
+import os
+import time
+
+import streamlit as st
+
+from termreport import charts
+from termreport.jobs import report_jobs
+from termreport.store import datasets
+from termreport.timing import cache_stats, server, session_timings
+from termreport.workers import pool
+
+ADMIN_TOKEN = os.environ.get("TERMREPORT_ADMIN_TOKEN", "")
+
+
+def is_admin():
+    if ADMIN_TOKEN and st.query_params.get("admin") == ADMIN_TOKEN:
+        st.session_state['admin'] = True
+    return st.session_state.get('admin', False)
+
+
+def begin_rerun():
+    """Return this session's :class:`~termreport.timing.Timings`, starting a profile if one was requested."""
+    timings = session_timings(st.session_state)
+    if timings.profiling:
+        timings.stop_profile()  # The previous rerun ended early (st.stop or a rerun)
+    if st.session_state.pop('profile_next_rerun', False):
+        timings.start_profile()
+    timings.rerun_started = time.perf_counter()
+    return timings
+
+
+def sidebar_panel(timings):
+    """Record the rerun, finish its profile and, for admins, draw the timing panel."""
+    if timings.rerun_started is not None:
+        timings.record("rerun", time.perf_counter() - timings.rerun_started)
+        timings.rerun_started = None
+    timings.stop_profile()
+    if not is_admin():
+        return
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        st.markdown("**This session** (recent reruns)")
+        st.dataframe(timings.summary().style.format(precision=1, subset=['Last ms', 'Mean ms', 'p95 ms']))
+        st.markdown("**Background work** (all sessions)")
+        st.dataframe(server.summary().style.format(precision=1, subset=['Last ms', 'Mean ms', 'p95 ms']))
+        st.markdown("**Caches** (all sessions)")
+        caches = {"Datasets": datasets, "Charts": charts.chart_cache, "Reports": report_jobs.results}
+        st.dataframe(cache_stats(caches).style.format({'Hit rate': "{:.0%}", 'Size MB': "{:.1f}"}, na_rep="–"))
+        st.caption(f"Worker pool: {pool.running} of {pool.workers} workers busy, {pool.queued} queued; "
+                   f"{pool.deduplicated} of {pool.submitted} requests shared an identical job.")
+        if st.button("Profile next rerun"):
+            st.session_state['profile_next_rerun'] = True
+            st.rerun()
+        if timings.profile_text:
+            st.code(timings.profile_text, language=None)
+            st.download_button("Download profile (.prof)", timings.profile_data,
+                               file_name=f"termreport-{timings.session}.prof")
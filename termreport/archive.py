@@ -0,0 +1,80 @@
+"""On-disk columnar cache of parsed assessments.
+
+Each parsed sheet is written once as an uncompressed Arrow IPC file named
+after the workbook's content hash, with the template metadata (name column,
+question list, max marks) in the schema metadata. Later loads of the same
+bytes memory-map that file instead of going through openpyxl again.
+
+The cache lives in ``TERMREPORT_CACHE_DIR`` (default ``~/.cache/termreport``);
+set it to an empty string to disable it. Failures to read or write are never
+fatal: the caller just parses the workbook.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+
+FORMAT_VERSION = 4  # 2: compact mark dtypes; 3: streaming reader; 4: per-class maxima of batches
+CACHE_DIR = os.environ.get("TERMREPORT_CACHE_DIR", str(Path.home() / ".cache" / "termreport"))
+
+_META_KEY = b"termreport"
+
+
+def cache_path(digest, sheet_name):
+    if not CACHE_DIR:
+        return None
+    sheet_token = hashlib.sha256(repr(sheet_name).encode()).hexdigest()[:12]
+    return Path(CACHE_DIR) / f"{digest}-{sheet_token}.arrow"
+
+
+def save(assessment):
+    """Write ``assessment`` to the cache; returns the path, or ``None`` if it was not cached."""
+    path = cache_path(assessment.digest, assessment.sheet_name)
+    if path is None:
+        return None
+    meta = {
+        "version": FORMAT_VERSION,
+        "name_col": assessment.name_col,
+        "question_cols": assessment.question_cols,
+        "max_possible": assessment.max_possible,
+        "class_max_possible": assessment.class_max_possible,
+        "sheet_name": assessment.sheet_name,
+    }
+    try:
+        table = pa.Table.from_pandas(assessment.df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except (OSError, pa.ArrowException, TypeError, ValueError):
+        # Columns pyarrow cannot represent (e.g. mixed text and numbers) or a
+        # read-only disk: skip caching
+        return None
+    return path
+
+
+def load(digest, sheet_name):
+    """Return the cached ``(df, name_col, question_cols, max_possible, class_max_possible)`` for a sheet, or ``None``."""
+    path = cache_path(digest, sheet_name)
+    if path is None or not path.exists():
+        return None
+    try:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        meta = json.loads(table.schema.metadata[_META_KEY])
+        if meta.get("version") != FORMAT_VERSION:
+            return None
+        # split_blocks keeps numeric columns as zero-copy views of the mapped file
+        df = table.to_pandas(split_blocks=True)
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+    return df, meta["name_col"], meta["question_cols"], meta["max_possible"], meta["class_max_possible"]
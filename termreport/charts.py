@@ -0,0 +1,348 @@
+"""Matplotlib/seaborn figures used by the dashboard and the Word report.
+
+Figures are built as standalone ``matplotlib.figure.Figure`` objects rather
+than through pyplot, so they are never registered in pyplot's global figure
+manager and nothing keeps them alive once rendered. Each figure is rendered
+once to PNG bytes and kept in a bounded LRU cache keyed on fingerprints of
+the columns it reads and the chart settings, so reruns, the docx export and
+charts unaffected by a mark correction reuse images instead of redrawing them. Cache misses are drawn on the shared worker pool
+(:mod:`termreport.workers`), so rendering runs outside the session threads.
+
+Per-learner charts draw one mark per learner. Above
+``LARGE_CLASS_THRESHOLD`` learners (``TERMREPORT_LARGE_CLASS``, default 250,
+well above a single class, so grade-level data) callers switch to the
+aggregated kinds in ``AGGREGATE_KINDS`` and page through individual learners
+``LEARNERS_PER_PAGE`` at a time, so render cost no longer grows with class size.
+"""
+import hashlib
+import os
+from concurrent.futures import Future
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from termreport.cache import ByteCache
+from termreport.workers import pool
+
+CHART_OPTIONS = ["Vertical Bar", "Scatter Plot", "Box Plot"]
+PNG_DPI = 150
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+LARGE_CLASS_THRESHOLD = int(os.environ.get("TERMREPORT_LARGE_CLASS", 250))
+LEARNERS_PER_PAGE = 100  # Learners per page of the per-learner charts and the marks editor
+EXTREMES_N = 10  # Learners shown at each end of the top/bottom chart
+PERFORMANCE_BANDS = 10  # Learner bands (rows) of the heatmap
+
+
+def new_figure(figsize):
+    """Create a figure with one axes, outside pyplot's figure manager."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def release_figure(fig):
+    """Drop every artist of a rendered figure so its memory is freed immediately."""
+    fig.clear()
+
+
+@contextmanager
+def rendering(fig):
+    """Own a figure for the duration of a block and release it afterwards."""
+    try:
+        yield fig
+    finally:
+        release_figure(fig)
+
+
+def percentage_per_learner(df, name_col):
+    fig, ax1 = new_figure(figsize=(8, max(5, len(df) * 0.3)))
+    bars = ax1.barh(df[name_col], df['Percentage'], color=sns.color_palette("Blues_d", len(df)))
+    for bar in bars:
+        bar.set_edgecolor('#003366')
+        bar.set_linewidth(1)
+    ax1.set_title("Percentage per Learner", color='#003366', pad=20)
+    ax1.set_xlabel("Percentage (%)")
+    ax1.set_ylabel("Learner")
+    ax1.invert_yaxis()
+    ax1.grid(True, axis='x', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def total_marks(df, name_col, chart_type):
+    fig, ax1 = new_figure(figsize=(10, 6))
+    if chart_type == "Vertical Bar":
+        sns.barplot(x=df[name_col], y=df['Total'], ax=ax1, palette="Blues_d")
+        ax1.set_title("Total Marks per Learner", color='#003366', pad=20)
+        ax1.set_xlabel("Learner")
+        ax1.set_ylabel("Total Marks")
+        ax1.set_xticklabels(ax1.get_xticklabels(), rotation=90, ha='center')
+        ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
+    elif chart_type == "Scatter Plot":
+        ax1.scatter(df[name_col], df['Total'], color='#003366', edgecolor='black', s=100)
+        ax1.set_title("Total Marks per Learner", color='#003366', pad=20)
+        ax1.set_xlabel("Learner")
+        ax1.set_ylabel("Total Marks")
+        ax1.set_xticklabels(df[name_col], rotation=60, ha='right')
+        ax1.grid(True, linestyle='--', alpha=0.7)
+    elif chart_type == "Box Plot":
+        sns.boxplot(y=df['Total'], ax=ax1, color='#003366', boxprops=dict(edgecolor='black'))
+        ax1.set_title("Distribution of Total Marks", color='#003366', pad=20)
+        ax1.set_ylabel("Total Marks")
+        ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def marks_breakdown(df, name_col, question_cols):
+    fig, ax = new_figure(figsize=(10, 6))
+    df.set_index(name_col)[question_cols].plot(kind='bar', stacked=True, ax=ax, colormap="Paired")
+    ax.set_title("Marks Breakdown by Learner and Question", color='#003366', pad=20)
+    ax.set_xlabel("Learner")
+    ax.set_ylabel("Marks")
+    ax.set_xticklabels(ax.get_xticklabels(), rotation=90, ha='center')
+    ax.legend(title="Questions", bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+    return fig
+
+
+def question_averages(active_means):
+    fig, ax_q = new_figure(figsize=(8, 5))
+    sns.barplot(x=active_means.index, y=active_means.values, ax=ax_q, palette="Greens_d")
+    ax_q.set_title("Average Marks per Question", color='#003366')
+    ax_q.set_xlabel("Question")
+    ax_q.set_ylabel("Average Mark")
+    ax_q.set_xticklabels(ax_q.get_xticklabels(), rotation=45, ha='right')
+    return fig
+
+
+def question_distribution(marks, question):
+    fig, ax2 = new_figure(figsize=(6, 6))
+    question_data = marks.value_counts()
+    total = question_data.sum()
+    percentages = [(count / total * 100) for count in question_data]
+    wedges, texts, autotexts = ax2.pie(
+        question_data,
+        startangle=90,
+        colors=sns.color_palette("Set2", len(question_data)),
+        autopct='%1.1f%%',
+        pctdistance=0.85,
+        wedgeprops={'edgecolor': 'white', 'linewidth': 1}
+    )
+    ax2.axis('equal')
+    ax2.set_title(f"Distribution of Marks for {question}", color='#003366', pad=20)
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontsize(10)
+        autotext.set_weight('bold')
+    ax2.legend(
+        labels=[f"{mark}: {pct:.1f}%" for mark, pct in zip(question_data.index, percentages)],
+        title="Marks (Percentage)",
+        loc="center left",
+        bbox_to_anchor=(1, 0, 0.5, 1)
+    )
+    fig.tight_layout()
+    return fig
+
+
+def is_large_class(df):
+    return len(df) > LARGE_CLASS_THRESHOLD
+
+
+def learner_page(df, page, per_page=LEARNERS_PER_PAGE):
+    """Rows of the 1-based ``page`` when learners are shown ``per_page`` at a time."""
+    return df.iloc[(page - 1) * per_page:page * per_page]
+
+
+def extremes(df, n=EXTREMES_N):
+    """The ``n`` highest and ``n`` lowest learners by percentage, best first, without overlap."""
+    ranked = df.sort_values('Percentage', ascending=False, kind='stable')
+    return ranked.head(n), ranked.iloc[max(n, len(ranked) - n):]
+
+
+def performance_bands(df, question_cols, bands=PERFORMANCE_BANDS):
+    """Average mark per question for equal-sized learner bands ranked by percentage (best band first).
+
+    Rows are labelled with the percentage range of their learners.
+    """
+    ranks = df['Percentage'].rank(method='first', ascending=False).to_numpy()
+    band = pd.qcut(ranks, min(bands, len(df)), labels=False)
+    means = df[question_cols].groupby(band).mean()
+    spread = df['Percentage'].groupby(band).agg(['min', 'max'])
+    means.index = [f"{low:.0f}–{high:.0f}%" for low, high in zip(spread['min'], spread['max'])]
+    means.index.name = "Learners (percentage)"
+    return means
+
+
+def percentage_histogram(df):
+    fig, ax = new_figure(figsize=(8, 5))
+    ax.hist(df['Percentage'].dropna().clip(0, 100), bins=np.arange(0, 101, 10), color='#4A90C2', edgecolor='#003366')
+    for q, value in df['Percentage'].quantile(np.arange(0.1, 1.0, 0.1).round(1)).items():
+        ax.axvline(value, color='#D32F2F' if q == 0.5 else '#555555', linestyle='--', linewidth=1.5 if q == 0.5 else 0.8)
+    ax.set_title(f"Percentage Distribution of {len(df)} Learners (deciles dashed, median red)", color='#003366', pad=20)
+    ax.set_xlabel("Percentage (%)")
+    ax.set_ylabel("Learners")
+    ax.grid(True, axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def top_bottom_learners(df, name_col, n=EXTREMES_N):
+    top, bottom = extremes(df, n)
+    fig, ax = new_figure(figsize=(8, max(5, (len(top) + len(bottom)) * 0.3)))
+    ax.barh(top[name_col], top['Percentage'], color='#4A90C2', edgecolor='#003366', label=f"Top {len(top)}")
+    ax.barh(bottom[name_col], bottom['Percentage'], color='#E57373', edgecolor='#8B0000', label=f"Bottom {len(bottom)}")
+    ax.set_title(f"Top and Bottom {n} Learners", color='#003366', pad=20)
+    ax.set_xlabel("Percentage (%)")
+    ax.invert_yaxis()
+    ax.legend(loc='lower right')
+    ax.grid(True, axis='x', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def band_heatmap(df, question_cols):
+    means = performance_bands(df, question_cols)
+    fig, ax = new_figure(figsize=(min(max(8, len(question_cols) * 0.5), 24), 6))
+    sns.heatmap(means, ax=ax, cmap="Blues", annot=len(question_cols) <= 20, fmt=".1f",
+                cbar_kws={'label': "Average Mark"}, linewidths=0.5)
+    ax.set_title("Average Marks per Question by Performance Band", color='#003366', pad=20)
+    ax.set_xlabel("Question")
+    fig.tight_layout()
+    return fig
+
+
+CHART_KINDS = ['percentage', 'total', 'breakdown', 'question_averages', 'distribution',
+               'percentage_histogram', 'extremes', 'heatmap']
+# Class-level replacements for the per-learner charts of large classes
+AGGREGATE_KINDS = ['percentage_histogram', 'extremes', 'heatmap']
+
+
+def draw_chart(kind, df, name_col=None, question_cols=None, chart_type=None, question=None, means=None):
+    """Draw one of ``CHART_KINDS`` and return the figure."""
+    if kind == 'percentage':
+        return percentage_per_learner(df, name_col)
+    if kind == 'total':
+        return total_marks(df, name_col, chart_type)
+    if kind == 'breakdown':
+        return marks_breakdown(df, name_col, question_cols)
+    if kind == 'question_averages':
+        return question_averages(means)
+    if kind == 'distribution':
+        return question_distribution(df[question], question)
+    if kind == 'percentage_histogram':
+        return percentage_histogram(df)
+    if kind == 'extremes':
+        return top_bottom_learners(df, name_col)
+    if kind == 'heatmap':
+        return band_heatmap(df, question_cols)
+    raise ValueError(f"Unknown chart kind: {kind}")
+
+
+def column_hashes(df, columns=None):
+    """Fingerprint of the values of each of ``columns`` (default: all), keyed by column label."""
+    return {col: hashlib.sha256(pd.util.hash_pandas_object(df[col], index=False).to_numpy().tobytes()).hexdigest()
+            for col in (df.columns if columns is None else columns)}
+
+
+def data_fingerprint(df, hashes=None):
+    """Stable hash of a frame's contents and column labels.
+
+    ``hashes`` (from :func:`column_hashes`) saves hashing the columns again.
+    """
+    hashes = hashes or column_hashes(df)
+    digest = hashlib.sha256()
+    digest.update(repr(list(df.columns)).encode())
+    for col in df.columns:
+        digest.update(hashes[col].encode())
+    return digest.hexdigest()
+
+
+def figure_to_png(fig):
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=PNG_DPI, bbox_inches="tight")
+    return buf.getvalue()
+
+
+def compact_png(png, width_inches, dpi):
+    """Downscale a cached PNG to ``width_inches`` at ``dpi`` and reduce it to a 256-colour palette."""
+    image = Image.open(BytesIO(png))
+    width = round(width_inches * dpi)
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    buf = BytesIO()
+    image.convert("RGB").quantize(colors=256).save(buf, format="png", optimize=True)
+    return buf.getvalue()
+
+
+chart_cache = ByteCache(CACHE_MAX_BYTES)
+
+
+def chart_frame(kind, df, name_col=None, question_cols=None, question=None):
+    """The columns of ``df`` that ``kind`` reads, so only they are sent to a worker process."""
+    columns = {
+        'percentage': [name_col, 'Percentage'],
+        'total': [name_col, 'Total'],
+        'breakdown': [name_col] + list(question_cols or []),
+        'question_averages': [],
+        'distribution': [question],
+        'percentage_histogram': ['Percentage'],
+        'extremes': [name_col, 'Percentage'],
+        'heatmap': list(question_cols or []) + ['Percentage'],
+    }.get(kind)
+    return df if columns is None else df[columns]
+
+
+def render_png(kind, df, name_col=None, question_cols=None, chart_type=None, question=None, means=None):
+    """Draw one chart and return its PNG bytes."""
+    with rendering(draw_chart(kind, df, name_col, question_cols, chart_type, question, means)) as fig:
+        return figure_to_png(fig)
+
+
+def chart_key(kind, df, name_col=None, question_cols=None, chart_type=None, question=None, means=None, hashes=None):
+    """Cache key of one chart: its settings and the fingerprints of only the columns it reads.
+
+    Editing a mark therefore changes the key of the charts showing that
+    question or the totals, but not of the others.
+    """
+    frame = chart_frame(kind, df, name_col, question_cols, question)
+    hashes = hashes or {}
+    digest = hashlib.sha256(repr((list(frame.columns), means is not None)).encode())
+    for col in frame.columns:
+        digest.update((hashes.get(col) or column_hashes(frame, [col])[col]).encode())
+    if means is not None:
+        digest.update(pd.util.hash_pandas_object(means).to_numpy().tobytes())
+    return digest.hexdigest(), kind, chart_type if kind == 'total' else None, question
+
+
+def submit_png(kind, df, name_col=None, question_cols=None, chart_type=None, question=None,
+               means=None, hashes=None, session=None):
+    """Return a Future of the PNG bytes for one chart, rendering on the shared worker pool on a cache miss.
+
+    ``kind`` is one of ``CHART_KINDS``. Pass ``hashes`` (from
+    :func:`column_hashes` of ``df``) when rendering several charts of the same
+    frame, and ``session`` so the pool can share workers fairly between
+    sessions.
+    """
+    key = chart_key(kind, df, name_col, question_cols, chart_type, question, means, hashes)
+    png = chart_cache.get(key)
+    if png is not None:
+        future = Future()
+        future.set_result(png)
+        return future
+    future = pool.submit(('chart',) + key, render_png, kind, chart_frame(kind, df, name_col, question_cols, question),
+                         name_col, question_cols, chart_type, question, means, session=session)
+    future.add_done_callback(lambda done: done.exception() is None and chart_cache.put(key, done.result()))
+    return future
+
+
+def chart_png(kind, df, name_col=None, question_cols=None, chart_type=None, question=None,
+              means=None, hashes=None, session=None):
+    """Return the PNG bytes for one chart, drawing it only on a cache miss (see :func:`submit_png`)."""
+    return submit_png(kind, df, name_col, question_cols, chart_type, question, means, hashes, session).result()
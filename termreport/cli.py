@@ -0,0 +1,119 @@
+"""Command-line report generator.
+
+Writes the same reports as the dashboard's "Download Full Report" button,
+without a Streamlit server::
+
+    python -m termreport "PUNT PER VRAAG ANALISE.xlsx" -o reports/
+    python -m termreport grade11/*.xlsx --all-sheets --jobs 8 -o reports/
+    python -m termreport grade11/*.xlsx --format pdf learners -o reports/
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+
+from termreport.charts import CHART_OPTIONS
+from termreport.cube import build_cube
+from termreport.export import build_class_pdf, write_learner_reports
+from termreport.ingest import TemplateError, load_assessment, read_bytes, sheet_names
+from termreport.report import IMAGE_QUALITY, build_report, render_report
+from termreport.workers import pool as worker_pool
+
+FORMATS = {"docx": ".docx", "pdf": ".pdf", "learners": " - learners.zip"}  # Format -> file name ending
+
+
+def report_path(output_dir, path, sheet_name=None, ending=".docx"):
+    stem = Path(path).stem
+    if sheet_name is not None:
+        stem = f"{stem} - {sheet_name}"
+    return Path(output_dir) / f"{stem}{ending}"
+
+
+def describe(error):
+    return str(error) if isinstance(error, TemplateError) else f"{type(error).__name__}: {error}"
+
+
+def generate_report(path, sheet_name, outputs, chart, image_quality="Standard"):
+    """Parse one sheet and write its reports to ``outputs`` (format -> path).
+
+    Returns ``None``, or the exception that stopped this report: a
+    :class:`TemplateError` if the sheet does not follow the template. Any
+    error is returned rather than raised, so one unreadable workbook does not
+    stop a batch run.
+    """
+    try:
+        assessment = load_assessment(path, 0 if sheet_name is None else sheet_name)
+        df, name_col, question_cols = assessment.df, assessment.name_col, assessment.question_cols
+        for fmt, out_path in outputs.items():
+            if fmt == "learners":
+                write_learner_reports(out_path, build_cube(df, name_col, question_cols))
+                continue
+            builder = build_class_pdf if fmt == "pdf" else build_report
+            stream = render_report(df, name_col, question_cols, chart, image_quality=image_quality, builder=builder)
+            Path(out_path).write_bytes(stream.getvalue())
+    except Exception as e:
+        return e
+    return None
+
+
+def plan_jobs(paths, output_dir, all_sheets, formats=("docx",)):
+    """One ``(path, sheet, outputs)`` job per report, and ``(path, error)`` for workbooks whose sheets cannot be listed."""
+    jobs, failed = [], []
+    for path in paths:
+        try:
+            sheets = sheet_names(read_bytes(path)) if all_sheets else [None]
+        except Exception as e:
+            failed.append((path, e))
+            continue
+        for sheet in sheets:
+            outputs = {fmt: report_path(output_dir, path, sheet, FORMATS[fmt]) for fmt in formats}
+            jobs.append((path, sheet, outputs))
+    return jobs, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m termreport", description="Generate learner performance reports from template workbooks.")
+    parser.add_argument("workbooks", nargs="+", help="template .xlsx files")
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for the reports (default: current directory)")
+    parser.add_argument("--chart", choices=CHART_OPTIONS, default=CHART_OPTIONS[0], help="chart type for Total Marks per Learner")
+    parser.add_argument("--image-quality", choices=list(IMAGE_QUALITY), default="Standard", help="Compact embeds smaller chart images")
+    parser.add_argument("--format", nargs="+", choices=list(FORMATS), default=["docx"],
+                        help="report formats: the Word report, the same report as PDF, and/or a zip of one-page PDFs per learner")
+    parser.add_argument("--all-sheets", action="store_true", help="write one report per class sheet instead of using the first sheet only")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of reports to build in parallel (0 = one per CPU)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs, failed = plan_jobs(args.workbooks, args.output_dir, args.all_sheets, list(dict.fromkeys(args.format)))
+    workers = args.jobs or os.cpu_count() or 1
+
+    for path, error in failed:
+        print(f"failed {path}: {describe(error)}", file=sys.stderr)
+    failures = len(failed)
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = [pool.submit(generate_report, path, sheet, out, args.chart, args.image_quality) for path, sheet, out in jobs]
+            # A worker that died fails its report rather than the run
+            results = [future.exception() or future.result() for future in futures]
+    else:
+        if workers > 1:
+            # A single report spreads its charts and learner pages over the worker pool instead
+            worker_pool.workers = workers
+            worker_pool.start()
+        results = [generate_report(path, sheet, out, args.chart, args.image_quality) for path, sheet, out in jobs]
+
+    for (path, sheet, outputs), error in zip(jobs, results):
+        source = path if sheet is None else f"{path} [{sheet}]"
+        if error is None:
+            for out in outputs.values():
+                print(f"wrote {out}")
+        elif args.all_sheets and isinstance(error, TemplateError):
+            print(f"skipped {source}: {describe(error)}", file=sys.stderr)
+        else:
+            print(f"failed {source}: {describe(error)}", file=sys.stderr)
+            failures += 1
+    return 1 if failures else 0
@@ -0,0 +1,75 @@
+"""Per-question comparison of any number of groups (classes or schools)."""
+import numpy as np
+import pandas as pd
+
+GROUP_COL = 'Group'
+STATS = ['N', 'Mean', 'Median', 'Q1', 'Q3', 'SD', 'Effect Size']
+
+
+def common_questions(groups, candidates):
+    """Questions listed in ``candidates`` for every group and with marks entered in each.
+
+    ``candidates`` maps each group label to its question columns; the order of
+    the first group is kept.
+    """
+    labels = list(groups)
+    questions = candidates[labels[0]]
+    for label in labels:
+        questions = [q for q in questions if q in candidates[label] and groups[label][q].sum() > 0]
+    return questions
+
+
+def stack_groups(groups, questions):
+    """One frame of all learners' marks for ``questions`` with a categorical "Group" column."""
+    stacked = pd.concat([df[questions] for df in groups.values()], ignore_index=True)
+    labels = np.repeat(list(groups), [len(df) for df in groups.values()])
+    stacked[GROUP_COL] = pd.Categorical(labels, categories=list(groups))
+    return stacked
+
+
+def question_stats(stacked, questions, reference=None):
+    """Per group and question: count, mean, median, quartiles, SD and Cohen's d.
+
+    The effect size compares each group with ``reference`` (default: the first
+    group) using the pooled standard deviation. Returns a long frame indexed by
+    (Group, Question).
+    """
+    grouped = stacked.groupby(GROUP_COL, observed=True)[questions]
+    n = grouped.count()
+    means = grouped.mean()
+    sd = grouped.std()
+    quartiles = grouped.quantile([0.25, 0.5, 0.75])
+
+    reference = means.index[0] if reference is None else reference
+    ref_n, ref_sd = n.loc[reference], sd.loc[reference]
+    pooled = np.sqrt(((n - 1) * sd ** 2 + (ref_n - 1) * ref_sd ** 2) / (n + ref_n - 2))
+    effect = (means - means.loc[reference]) / pooled.replace(0, np.nan)
+
+    wide = {
+        'N': n,
+        'Mean': means,
+        'Median': quartiles.xs(0.5, level=1),
+        'Q1': quartiles.xs(0.25, level=1),
+        'Q3': quartiles.xs(0.75, level=1),
+        'SD': sd,
+        'Effect Size': effect,
+    }
+    long = pd.concat({stat: frame.stack() for stat, frame in wide.items()}, axis=1)
+    long.index.names = [GROUP_COL, 'Question']
+    return long[STATS]
+
+
+def group_summary(groups):
+    """Learner count and percentage spread per group."""
+    summary = pd.DataFrame.from_dict({
+        label: {
+            'Learners': len(df),
+            'Average %': df['Percentage'].mean(),
+            'Median %': df['Percentage'].median(),
+            'SD %': df['Percentage'].std(),
+        }
+        for label, df in groups.items()
+    }, orient='index')
+    summary['Learners'] = summary['Learners'].astype(int)
+    summary.index.name = GROUP_COL
+    return summary
@@ -0,0 +1,130 @@
+"""Precomputed statistics behind the Advanced Learner Analysis page.
+
+A :class:`StatsCube` is built once per parsed dataset and shared between
+sessions through a bounded store, so widget changes on the page read
+descriptive stats, ranks, per-learner comparisons and the learner search
+index instead of recomputing them from the frame on every rerun.
+"""
+import dataclasses
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from termreport.roster import LearnerIndex, build_index
+from termreport.store import DatasetStore
+
+CUBE_MAX_BYTES = int(os.environ.get("TERMREPORT_CUBE_MB", 128)) * 2**20
+WEAKEST_N = 5
+REFRESH_MAX_SHARE = 0.25  # Above this share of changed questions, corrections rebuild the cube
+
+
+@dataclass
+class StatsCube:
+    names: list
+    all_question_cols: list
+    question_cols: list  # Questions with marks entered
+    marks: pd.DataFrame  # Learner rows (by position) x active questions
+    describe: pd.DataFrame  # One row per active question: count, mean, std, min, quartiles, max
+    value_counts: dict  # Question -> Series of learners per mark
+    ranks: pd.Series  # Learner position -> class rank by percentage (1 = best)
+    deltas: pd.DataFrame  # Learner mark minus class average, per active question
+    correlations: pd.DataFrame
+    roster: LearnerIndex  # Learner search and filters
+
+    @property
+    def means(self):
+        return self.describe['mean']
+
+    @property
+    def weakest(self):
+        return self.means.sort_values().head(WEAKEST_N)
+
+    @property
+    def nbytes(self):
+        frames = [self.marks, self.describe, self.deltas, self.correlations]
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames)) + self.roster.nbytes
+
+    def learner_marks(self, learner):
+        """Marks per active question for the learner at row position ``learner``."""
+        return self.marks.iloc[learner]
+
+    def learner_comparison(self, learner):
+        """Long frame of Question / Category ('Learner' or 'Class Average') / Marks for one learner."""
+        n = len(self.question_cols)
+        return pd.DataFrame({
+            "Question": self.question_cols * 2,
+            "Category": ["Learner"] * n + ["Class Average"] * n,
+            "Marks": list(self.marks.iloc[learner]) + list(self.means),
+        })
+
+    def largest_gap(self, learner):
+        """The active question where the learner is furthest below the class average, and that gap."""
+        gaps = self.deltas.iloc[learner]
+        question = gaps.idxmin()
+        return question, gaps[question]
+
+
+def build_cube(df, name_col, all_question_cols):
+    """Compute every statistic the analysis page reads, for the parsed question columns."""
+    all_question_cols = list(all_question_cols)
+    sums = df[all_question_cols].sum()
+    question_cols = [col for col in all_question_cols if sums[col] > 0]  # Only questions with non-zero sums
+
+    marks = df[question_cols].reset_index(drop=True)
+    describe = marks.describe().T
+    return StatsCube(
+        names=df[name_col].tolist(),
+        all_question_cols=all_question_cols,
+        question_cols=question_cols,
+        marks=marks,
+        describe=describe,
+        value_counts={q: marks[q].value_counts().sort_index() for q in question_cols},
+        ranks=df['Percentage'].rank(ascending=False, method='min').astype('Int64').reset_index(drop=True),
+        deltas=marks - describe['mean'],
+        correlations=marks.corr(),
+        roster=build_index(df, name_col),
+    )
+
+
+def refresh_cube(cube, df, name_col, changed):
+    """The cube for ``df`` after corrections to the ``changed`` columns, recomputing only what they affect."""
+    questions = [q for q in cube.all_question_cols if q in changed]
+    if any((df[q].sum() > 0) != (q in cube.question_cols) for q in questions):
+        return build_cube(df, name_col, cube.all_question_cols)  # A question gained its first marks or lost its last ones
+    if len(questions) > REFRESH_MAX_SHARE * len(cube.question_cols):
+        return build_cube(df, name_col, cube.all_question_cols)  # Cheaper than refreshing most of the correlation matrix
+    questions = [q for q in questions if q in cube.question_cols]
+    marks = df[cube.question_cols].reset_index(drop=True)
+    describe = cube.describe.copy()
+    value_counts = dict(cube.value_counts)
+    correlations = cube.correlations.copy()
+    for question in questions:
+        describe.loc[question] = marks[question].describe()
+        value_counts[question] = marks[question].value_counts().sort_index()
+        column = marks.corrwith(marks[question])
+        correlations[question] = column
+        correlations.loc[question] = column
+    return dataclasses.replace(
+        cube,
+        names=df[name_col].tolist(),
+        marks=marks,
+        describe=describe,
+        value_counts=value_counts,
+        ranks=df['Percentage'].rank(ascending=False, method='min').astype('Int64').reset_index(drop=True),
+        deltas=marks - describe['mean'],
+        correlations=correlations,
+        roster=build_index(df, name_col),
+    )
+
+
+cubes = DatasetStore(CUBE_MAX_BYTES)
+
+
+def stats_cube(key, dataset):
+    """The cube for the stored dataset ``key``, built on first use."""
+    cube = cubes.get(key)
+    if cube is None:
+        cube = build_cube(dataset.df, dataset.name_col, dataset.question_cols)
+        cubes.put(key, cube)
+    return cube
@@ -0,0 +1,140 @@
+"""In-app mark corrections with incremental aggregation.
+
+A :class:`MarkSheet` is a session's editable copy of an assessment. It keeps
+running learner totals, question sums and tiers and a fingerprint of every
+column. Applying corrections updates only the edited learners' Total,
+Percentage and tier, the edited questions' sums and the fingerprints of the
+columns that changed. Charts are cached on the fingerprints of the columns
+they read (:func:`termreport.charts.chart_key`), so after a correction only
+the charts showing changed data are redrawn; the stats cube is refreshed for
+the changed questions instead of being rebuilt.
+
+Each corrected version is published to the shared dataset store under its
+own key, so the analysis page and the report see the corrected marks.
+"""
+import dataclasses
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from termreport.charts import column_hashes
+from termreport.cube import cubes, refresh_cube
+from termreport.ingest import compact_frame, mark_dtype
+from termreport.insights import assign_tiers
+from termreport.store import datasets
+
+
+def _fits(value, dtype):
+    # Whether ``dtype`` stores ``value`` exactly
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return float(value).is_integer() and info.min <= value <= info.max
+    return dtype.type(value) == value
+
+
+def diff_marks(df, question_cols, rows, edited):
+    """``(row, question, mark)`` for every cell where ``edited`` differs from ``df`` at row positions ``rows``.
+
+    ``edited`` holds the question columns of those learners, as returned by
+    ``st.data_editor``; blank cells count as 0, unless the question was
+    already blank for that learner (not written by their class, in a batch).
+    """
+    questions = [q for q in question_cols if q in edited.columns]
+    new = edited[questions].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    current = df[questions].to_numpy(dtype=float)[rows]
+    new = np.where(np.isnan(new) & ~np.isnan(current), 0, new)
+    changed_rows, changed_cols = np.nonzero((new != current) & ~(np.isnan(new) & np.isnan(current)))
+    return [(int(rows[r]), questions[c], float(new[r, c])) for r, c in zip(changed_rows, changed_cols)]
+
+
+class MarkSheet:
+    def __init__(self, assessment):
+        self.base_key = assessment.key
+        self.assessment = dataclasses.replace(assessment, df=assessment.df.copy(),
+                                              question_cols=list(assessment.question_cols))
+        marks = self.df[self.question_cols].to_numpy(dtype=float)
+        self.totals = np.nansum(marks, axis=1)
+        self.sums = pd.Series(np.nansum(marks, axis=0), index=self.question_cols)
+        self.counts = pd.Series((~np.isnan(marks)).sum(axis=0), index=self.question_cols)  # Learners with a mark
+        self.maxima = assessment.maxima()  # Per learner: their own class's maximum in a batch
+        self.tiers = assign_tiers(self.df['Percentage'])
+        self.hashes = column_hashes(self.df)
+        self.corrections = 0  # Marks changed so far
+
+    @property
+    def df(self):
+        return self.assessment.df
+
+    @property
+    def question_cols(self):
+        return self.assessment.question_cols
+
+    @property
+    def key(self):
+        """Key of the current version in :data:`termreport.store.datasets`."""
+        return self.assessment.key
+
+    @property
+    def means(self):
+        return self.sums / self.counts.clip(lower=1)
+
+    def apply(self, changes):
+        """Apply ``(row, question, mark)`` corrections; return the set of columns that changed."""
+        # Published versions stay as they are: edit a copy-on-write copy
+        df = self.df.copy(deep=False)
+        widened = not all(_fits(mark, df[q].dtype) for _, q, mark in changes)
+        if widened:
+            # A half mark, or a mark larger than the question block holds: widen the whole block once
+            wider = np.result_type(df[self.question_cols[0]].dtype, mark_dtype(np.array([m for _, _, m in changes])))
+            df = compact_frame(df, self.question_cols, dtype=wider)
+        rows, questions = set(), set()
+        for row, question, mark in changes:
+            old = float(df[question].iat[row])
+            if old == mark:
+                continue
+            if np.isnan(old):
+                # A first mark for a question the learner's class did not write
+                old = 0.0
+                self.counts[question] += 1
+            self.corrections += 1
+            df.iloc[row, df.columns.get_loc(question)] = mark
+            self.totals[row] += mark - old
+            self.sums[question] += mark - old
+            rows.add(row)
+            questions.add(question)
+        if not rows:
+            return set()
+        if widened:
+            questions.update(self.question_cols)  # Their values now print as decimals
+
+        rows = sorted(rows)
+        totals = self.totals[rows]
+        if all(_fits(total, df['Total'].dtype) for total in totals):
+            df.iloc[rows, df.columns.get_loc('Total')] = totals
+        else:
+            df['Total'] = self.totals.astype(mark_dtype(self.totals))
+        percentages = totals / self.maxima[rows] * 100
+        df.iloc[rows, df.columns.get_loc('Percentage')] = percentages
+        self.tiers.iloc[rows] = assign_tiers(pd.Series(percentages)).to_numpy()
+
+        changed = questions | {'Total', 'Percentage'}
+        self.hashes.update(column_hashes(df, changed))
+        self._publish(df, changed)
+        return changed
+
+    def _publish(self, df, changed):
+        # The corrected contents get their own key; the version they replace is dropped
+        previous = self.key
+        digest = hashlib.sha256(repr(self.base_key).encode())
+        for col in df.columns:
+            digest.update(self.hashes[col].encode())
+        self.assessment = dataclasses.replace(self.assessment, df=df,
+                                              digest=f"{self.base_key[0]}+{digest.hexdigest()[:16]}")
+        datasets.put(self.key, self.assessment)
+        cube = cubes.get(previous)
+        if cube is not None:
+            cubes.put(self.key, refresh_cube(cube, self.df, self.assessment.name_col, changed))
+        if previous != self.base_key:
+            datasets.discard(previous)
+            cubes.discard(previous)
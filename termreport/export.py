@@ -0,0 +1,372 @@
+"""PDF exports: the class report and one-page learner reports in bulk.
+
+The class PDF has the sections of the Word report and embeds the same cached
+chart images (:func:`termreport.report.render_report` renders them in
+parallel). Learner reports draw their charts with PDF lines and rectangles,
+so they stay vector and take milliseconds per page without matplotlib.
+Learners are rendered in batches on the shared worker pool and each batch is
+written to the zip as soon as it is done, so the command line writes a
+grade's learner reports to disk without holding them all in memory.
+"""
+import math
+import os
+import re
+import tempfile
+import zipfile
+from collections import deque
+from datetime import date
+from io import BytesIO
+
+from fpdf import FPDF
+
+from termreport import charts
+from termreport.insights import LEARNER_COLUMNS, analyse, class_summary, format_class_summary
+from termreport.items import alpha_rating, format_items, item_analysis
+from termreport.report import IMAGE_QUALITY, OVERVIEW_CHARTS, _picture_key, report_charts
+from termreport.workers import pool
+
+PDF_MIME = "application/pdf"
+ZIP_MIME = "application/zip"
+PDF_IMAGE_DPI = 120  # Charts are downsampled at least this far: fpdf parses PNGs in pure Python
+LEARNERS_PER_BATCH = 50  # Learner reports per worker task
+CHART_QUESTIONS = 40  # Questions drawn in a learner's charts; beyond this, the ones furthest below average
+RADAR_LABELS = 16  # Label the radar spokes only up to this many questions
+NAVY = (0, 51, 102)
+GREEN = (76, 175, 80)
+GREY = (200, 200, 200)
+# fpdf's core fonts cover Latin-1 only
+PUNCTUATION = str.maketrans({"–": "-", "—": "-", "‘": "'", "’": "'", "“": '"', "”": '"', "…": "...", "·": "-"})
+
+
+def latin1(text):
+    return str(text).translate(PUNCTUATION).encode('latin-1', 'replace').decode('latin-1')
+
+
+def fit(pdf, text, width):
+    """``text`` cut with "..." to fit ``width`` mm in the current font."""
+    text = latin1(text)
+    if pdf.get_string_width(text) <= width:
+        return text
+    # One pass over the character widths: long question lists are cut in every tier table row
+    room = (width - pdf.get_string_width("...")) * 1000 / pdf.font_size
+    widths = pdf.current_font['cw']
+    used = 0
+    for i, char in enumerate(text):
+        used += widths.get(char, 0)
+        if used > room:
+            return text[:i] + "..."
+    return text
+
+
+class ReportPDF(FPDF):
+    def __init__(self, footer_text=""):
+        super().__init__(orientation='P', unit='mm', format='A4')
+        self.footer_text = latin1(footer_text)
+        self.set_auto_page_break(True, margin=15)
+        self.set_margins(15, 15, 15)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font('Arial', 'I', 8)
+        self.set_text_color(120, 120, 120)
+        self.cell(0, 5, f"{self.footer_text}  -  page {self.page_no()}", align='C')
+        self.set_text_color(0, 0, 0)
+
+    def heading(self, text, size=14):
+        self.set_font('Arial', 'B', size)
+        self.set_text_color(*NAVY)
+        self.cell(0, size * 0.6, latin1(text), ln=1)
+        self.set_text_color(0, 0, 0)
+        self.ln(1)
+
+    def paragraph(self, text, size=10, bullet=False):
+        self.set_font('Arial', '', size)
+        self.multi_cell(0, size * 0.5, latin1(("- " if bullet else "") + text))
+        self.ln(1)
+
+    def table(self, header, rows, size=9):
+        """Columns share the page width in proportion to their longest entry."""
+        self.set_font('Arial', '', size)
+        rows = [[latin1(value) for value in row] for row in rows]
+        longest = [max([self.get_string_width(latin1(h))] + [self.get_string_width(row[i]) for row in rows]) + 2
+                   for i, h in enumerate(header)]
+        scale = min(1.0, self.epw / sum(longest))
+        widths = [w * scale for w in longest]
+        height = size * 0.5
+        self.set_font('Arial', 'B', size)
+        for h, w in zip(header, widths):
+            self.cell(w, height, fit(self, h, w - 1), border=1)
+        self.ln()
+        self.set_font('Arial', '', size)
+        for row in rows:
+            for value, w in zip(row, widths):
+                self.cell(w, height, fit(self, value, w - 1), border=1)
+            self.ln()
+        self.ln(2)
+
+    @property
+    def epw(self):
+        return self.w - self.l_margin - self.r_margin
+
+
+def build_class_pdf(df, name_col, question_cols, selected_chart="Vertical Bar",
+                    insights=None, items=None, hashes=None, class_table=None, generated_on=None,
+                    image_quality="Standard", pictures=None, progress=None):
+    """The class report as a PDF in a ``BytesIO``; arguments as for :func:`termreport.report.build_report`."""
+    if insights is None:
+        insights = analyse(df, name_col, question_cols)
+    if class_table is None:
+        class_table = format_class_summary(class_summary(df))
+    hashes = hashes or charts.column_hashes(df)
+    generated_on = generated_on or date.today()
+    active_questions = insights.active_questions
+    if items is None and active_questions:
+        items = item_analysis(df, active_questions)
+    image_dpi = min(IMAGE_QUALITY[image_quality] or PDF_IMAGE_DPI, PDF_IMAGE_DPI)
+    figures = report_charts(df, selected_chart, insights)
+
+    pdf = ReportPDF(footer_text=f"Learner Performance Report - {generated_on:%B %d, %Y}")
+    steps = len(figures) + (1 if active_questions else 0) + 2
+    done = 0
+
+    def advance(section):
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done / steps, section)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def add_figures(figures, section):
+            for i, (kind, params, caption) in enumerate(figures):
+                png = (pictures or {}).get(_picture_key(kind, params))
+                if png is None:
+                    png = charts.chart_png(kind, df, name_col, question_cols, hashes=hashes, **params)
+                path = os.path.join(tmp, f"{section}-{i}.png")
+                with open(path, 'wb') as f:
+                    f.write(charts.compact_png(png, pdf.epw / 25.4, image_dpi))
+                pdf.image(path, w=pdf.epw)  # Parsed here, so the file can go with the directory
+                pdf.set_font('Arial', 'I', 9)
+                pdf.cell(0, 6, latin1(caption), ln=1, align='C')
+                pdf.ln(2)
+                advance(section)
+
+        # Title Page
+        pdf.add_page()
+        pdf.ln(80)
+        pdf.set_font('Arial', 'B', 24)
+        pdf.set_text_color(*NAVY)
+        pdf.cell(0, 14, "Learner Performance Report", ln=1, align='C')
+        pdf.set_font('Arial', '', 14)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(0, 9, "Saul Damon High School", ln=1, align='C')
+        pdf.cell(0, 9, f"Generated on {generated_on:%B %d, %Y}", ln=1, align='C')
+
+        # Performance Overview
+        pdf.add_page()
+        pdf.heading("Performance Overview", 16)
+        if not class_table.empty:
+            pdf.heading("Class Summary", 12)
+            pdf.table(list(class_table.columns), list(class_table.itertuples(index=False)))
+        add_figures(figures[:OVERVIEW_CHARTS], "Performance Overview")
+
+        # Question Analysis
+        pdf.add_page()
+        pdf.heading("Question Analysis", 16)
+        if active_questions:
+            add_figures(figures[OVERVIEW_CHARTS:], "Question Analysis")
+            pdf.heading("Item Analysis", 12)
+            pdf.paragraph(f"Cronbach's alpha is {items.alpha:.2f} ({alpha_rating(items.alpha)} reliability) over "
+                          f"{items.learners} learners and {len(items.items)} questions.{items.note}")
+            item_table = format_items(items)
+            pdf.table(list(item_table.columns), list(item_table.itertuples(index=False)), size=7)
+            advance("Item Analysis")
+
+        # Insights and Recommendations
+        pdf.add_page()
+        pdf.heading("Insights and Recommendations", 16)
+        pdf.paragraph(f"The class average percentage is {insights.avg_percentage:.2f}%.", bullet=True)
+        if active_questions and insights.weak_questions:
+            pdf.paragraph(f"Weak questions (below 70% of mean {insights.avg_question_mean:.1f}): "
+                          f"{', '.join(insights.weak_questions)}.", bullet=True)
+        for tier, learners in insights.learner_performance.items():
+            if not learners.empty:
+                pdf.heading(f"{tier} ({len(learners)} learners)", 11)
+                pdf.table(LEARNER_COLUMNS, list(learners.itertuples(index=False)), size=8)
+        advance("Insights and Recommendations")
+        for recommendation in insights.recommendations:
+            if recommendation.startswith("###"):
+                pdf.heading(recommendation.replace("### ", ""), 12)
+            else:
+                pdf.paragraph(recommendation.replace('**', '').lstrip("- "), bullet=True)
+
+    stream = BytesIO(pdf.output(dest='S').encode('latin-1'))
+    advance("Saving document")
+    return stream
+
+
+def _bar_chart(pdf, x, y, width, questions, marks, means):
+    """Horizontal bars of the learner's mark and the class average per question."""
+    row = min(7.0, max(2.5, 140 / max(len(questions), 1)))
+    label_width = 35
+    top = max(max(marks, default=0), max(means, default=0), 1)
+    scale = (width - label_width - 12) / top
+    pdf.set_font('Arial', '', max(5, min(8, row * 2)))
+    for i, (question, mark, mean) in enumerate(zip(questions, marks, means)):
+        row_y = y + i * row
+        pdf.set_xy(x, row_y)
+        pdf.cell(label_width - 1, row, fit(pdf, question, label_width - 2), align='R')
+        pdf.set_fill_color(*NAVY)
+        pdf.rect(x + label_width, row_y + row * 0.1, mark * scale, row * 0.4, 'F')
+        pdf.set_fill_color(*GREEN)
+        pdf.rect(x + label_width, row_y + row * 0.5, mean * scale, row * 0.4, 'F')
+    pdf.set_draw_color(*GREY)
+    pdf.line(x + label_width, y, x + label_width, y + len(questions) * row)
+    pdf.set_draw_color(0, 0, 0)
+    return y + len(questions) * row
+
+
+def _radar(pdf, cx, cy, radius, questions, marks, means):
+    """Profile of the learner's marks (navy) against the class average (green), as on the analysis page."""
+    k = len(questions)
+    top = max(max(marks, default=0), max(means, default=0), 1)
+
+    def point(i, value):
+        angle = math.pi / 2 - 2 * math.pi * i / k
+        return cx + radius * value / top * math.cos(angle), cy - radius * value / top * math.sin(angle)
+
+    pdf.set_draw_color(*GREY)
+    pdf.set_font('Arial', '', 6)
+    for i, question in enumerate(questions):
+        pdf.line(cx, cy, *point(i, top))
+        if k <= RADAR_LABELS:
+            lx, ly = point(i, top * 1.12)
+            pdf.set_xy(lx - 10, ly - 1.5)
+            pdf.cell(20, 3, fit(pdf, question, 20), align='C')
+    for values, colour in [([top] * k, GREY), (means, GREEN), (marks, NAVY)]:
+        pdf.set_draw_color(*colour)
+        pdf.set_line_width(0.2 if colour == GREY else 0.6)
+        corners = [point(i, value) for i, value in enumerate(values)]
+        for start, end in zip(corners, corners[1:] + corners[:1]):
+            pdf.line(*start, *end)
+    pdf.set_line_width(0.2)
+    pdf.set_draw_color(0, 0, 0)
+
+
+def draw_learner_page(pdf, card, questions, means, learners, generated_on):
+    """One learner's report page: summary, profile, focus areas and marks against the class average."""
+    pdf.add_page()
+    pdf.heading(card['name'], 16)
+    pdf.set_font('Arial', '', 10)
+    facts = [f"Percentage: {card['percentage']:.1f}%", f"Class rank: {card['rank']} of {learners}", f"Tier: {card['tier']}"]
+    if card['class'] is not None:
+        facts.insert(0, f"Class: {card['class']}")
+    pdf.cell(0, 6, latin1("   |   ".join(facts)), ln=1)
+    pdf.set_font('Arial', 'I', 8)
+    pdf.cell(0, 5, f"Generated on {generated_on:%B %d, %Y}", ln=1)
+    pdf.ln(2)
+    # Questions the learner's class did not write (in a combined batch) are left off
+    written = [i for i, mark in enumerate(card['marks']) if not math.isnan(mark)]
+    questions, means = [questions[i] for i in written], [means[i] for i in written]
+    if not questions:
+        pdf.paragraph("No questions have marks entered yet.")
+        return
+
+    marks = [card['marks'][i] for i in written]
+    deltas = [mark - mean for mark, mean in zip(marks, means)]
+    shown = list(range(len(questions)))
+    if len(shown) > CHART_QUESTIONS:
+        shown = sorted(sorted(shown, key=deltas.__getitem__)[:CHART_QUESTIONS])
+
+    top = pdf.get_y()
+    if len(shown) >= 3:
+        _radar(pdf, 15 + 42, top + 42, 32, [questions[i] for i in shown], [marks[i] for i in shown],
+                [means[i] for i in shown])
+
+    # Focus areas, beside the profile
+    weakest = min(range(len(marks)), key=marks.__getitem__)
+    furthest = min(range(len(deltas)), key=deltas.__getitem__)
+    strongest = max(range(len(deltas)), key=deltas.__getitem__)
+    above = sum(delta > 0 for delta in deltas)
+    pdf.set_xy(110, top + 8)
+    pdf.heading("Focus Areas", 12)
+    for line in [f"Lowest mark: {questions[weakest]} ({marks[weakest]:g})",
+                 f"Furthest below the class average: {questions[furthest]} ({deltas[furthest]:+.1f})",
+                 f"Furthest above the class average: {questions[strongest]} ({deltas[strongest]:+.1f})",
+                 f"Above the class average in {above} of {len(questions)} questions"]:
+        pdf.set_x(110)
+        pdf.set_font('Arial', '', 9)
+        pdf.multi_cell(85, 4.5, latin1("- " + line))
+        pdf.ln(1)
+
+    pdf.set_xy(15, top + 90)
+    title = "Marks per Question: Learner (navy) vs. Class Average (green)"
+    if len(shown) < len(questions):
+        title += f", the {len(shown)} questions furthest below average"
+    pdf.heading(title, 10)
+    _bar_chart(pdf, 15, pdf.get_y(), pdf.epw, [questions[i] for i in shown], [marks[i] for i in shown],
+               [means[i] for i in shown])
+
+
+def learner_file_name(position, name):
+    safe = re.sub(r"[^\w\- ,.]+", "_", str(name)).strip() or "learner"
+    return f"{position + 1:04d} {safe}.pdf"
+
+
+def learner_pdfs(questions, means, learners, generated_on, cards):
+    """``(file name, PDF bytes)`` for each learner card; runs in a worker process."""
+    files = []
+    for card in cards:
+        pdf = ReportPDF(footer_text=card['name'])
+        draw_learner_page(pdf, card, questions, means, learners, generated_on)
+        files.append((learner_file_name(card['position'], card['name']), pdf.output(dest='S').encode('latin-1')))
+    return files
+
+
+def learner_cards(cube, positions):
+    """The data a learner page shows, for the learners at row ``positions`` of ``cube``."""
+    roster = cube.roster
+    marks = cube.marks.to_numpy(dtype=float)
+    return [{
+        'position': int(position),
+        'name': roster.names[position],
+        'class': None if roster.classes is None else roster.classes[position],
+        'percentage': float(roster.percentage[position]),
+        'rank': cube.ranks[position],
+        'tier': roster.tiers[position],
+        'marks': marks[position].tolist(),
+    } for position in positions]
+
+
+def write_learner_reports(out, cube, generated_on=None, session=None, progress=None):
+    """Write a one-page PDF per learner of ``cube`` into the zip file ``out`` (a path or binary file).
+
+    Batches of learners are rendered on the shared worker pool, with at most
+    two batches per worker in flight, and written in roster order.
+    """
+    generated_on = generated_on or date.today()
+    questions, means, learners = cube.question_cols, cube.means.tolist(), len(cube.names)
+    batches = [range(start, min(start + LEARNERS_PER_BATCH, learners))
+               for start in range(0, learners, LEARNERS_PER_BATCH)]
+    in_flight = 2 * pool.workers if pool.started else 1
+    written = 0
+    # PDF page streams are already compressed
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_STORED) as archive:
+        pending = deque()
+        for i, batch in enumerate(batches):
+            pending.append(pool.submit(None, learner_pdfs, questions, means, learners, generated_on,
+                                       learner_cards(cube, batch), session=session))
+            while pending and (len(pending) >= in_flight or i == len(batches) - 1):
+                for file_name, data in pending.popleft().result():
+                    archive.writestr(file_name, data)
+                    written += 1
+                if progress is not None:
+                    progress(written / learners, "Learner reports")
+    return out
+
+
+def learner_reports_zip(cube, generated_on=None, session=None, progress=None):
+    """:func:`write_learner_reports` into a ``BytesIO``, for a download button."""
+    stream = BytesIO()
+    write_learner_reports(stream, cube, generated_on, session, progress)
+    stream.seek(0)
+    return stream
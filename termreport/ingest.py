@@ -0,0 +1,494 @@
+"""Workbook ingestion for the "PUNT PER VRAAG ANALISE" template.
+
+A template sheet has a header row containing "NAME OF LEARNER" followed by
+one column per question, and optionally a "TOTAAL:" row holding the maximum
+possible mark. Sheets are streamed row by row by :func:`read_template`, which
+stops at the end of the learner block, and the parsed result is memoized on a
+hash of the file bytes. :func:`parse_sheet` handles sheets already loaded
+with ``pd.read_excel``.
+
+Parsed frames are kept compact: all question columns share one block of the
+smallest dtype that holds the marks exactly (``uint8`` for whole marks up to
+255, ``float32`` for half marks), totals are downcast, and class labels are
+categorical.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+from termreport import archive
+from termreport.store import datasets
+from termreport.workers import pool
+
+NAME_MARKER = "name of learner"
+TOTAL_MARKER = "totaal:"
+DEFAULT_MAX_POSSIBLE = 50  # Used when the sheet has no "TOTAAL:" row
+
+CLASS_COL = "Class"
+
+
+class TemplateError(ValueError):
+    """Raised when a sheet does not follow the marks template."""
+
+
+@dataclass
+class Assessment:
+    df: pd.DataFrame
+    name_col: str
+    question_cols: list
+    max_possible: int  # None for a combined batch whose classes have different maxima
+    sheet_name: object = 0
+    digest: str = ""
+    class_max_possible: dict = None  # Class -> max_possible, for a combined batch
+
+    @property
+    def key(self):
+        """Key of this dataset in :data:`termreport.store.datasets`."""
+        return (self.digest, self.sheet_name)
+
+    def maxima(self):
+        """Maximum possible total per learner row: each class's own in a combined batch."""
+        if self.class_max_possible is None:
+            return np.full(len(self.df), self.max_possible, dtype=float)
+        return self.df[CLASS_COL].astype(str).map(self.class_max_possible).to_numpy(dtype=float)
+
+
+def read_bytes(source):
+    """Return the raw bytes of an upload, a path or a bytes object."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if hasattr(source, "read"):
+        pos = source.tell()
+        data = source.read()
+        source.seek(pos)
+        return data
+    with open(source, "rb") as fh:
+        return fh.read()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_marker_rows(raw):
+    """Locate the "NAME OF LEARNER" and "TOTAAL:" rows in one pass over the cells."""
+    header_row = total_row = None
+    for i, row in enumerate(raw.itertuples(index=False, name=None)):
+        for cell in row:
+            if not isinstance(cell, str):
+                continue
+            text = cell.lower()
+            if header_row is None and NAME_MARKER in text:
+                header_row = i
+            if total_row is None and TOTAL_MARKER in text:
+                total_row = i
+        if header_row is not None and total_row is not None:
+            break
+    return header_row, total_row
+
+
+def max_possible_from_cells(cells):
+    """The first whole number written in the cells of a "TOTAAL:" row."""
+    for cell in cells:
+        found = re.search(r'(\d+)', str(cell))
+        if found:
+            return int(found.group(1))
+    return DEFAULT_MAX_POSSIBLE
+
+
+def parse_max_possible(raw, total_row):
+    if total_row is None:
+        return DEFAULT_MAX_POSSIBLE
+    return max_possible_from_cells(raw.iloc[total_row])
+
+
+def _column_labels(header):
+    # Mirror pandas' header handling: blank cells become "Unnamed: n" and
+    # repeated labels get a ".1", ".2", ... suffix.
+    labels, seen = [], {}
+    for i, cell in enumerate(header):
+        label = f"Unnamed: {i}" if pd.isna(cell) else str(cell).strip()
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        else:
+            seen[label] = 0
+        labels.append(label)
+    return labels
+
+
+def mark_dtype(values):
+    """The smallest dtype that stores every value of a float array exactly, NaN included."""
+    if not len(values):
+        return np.uint8
+    missing = np.isnan(values)
+    marks = values[~missing]
+    if not missing.any() and np.array_equal(values, np.round(values)):
+        low, high = values.min(), values.max()
+        for dtype in (np.uint8, np.uint16, np.int16, np.int32):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return dtype
+    elif np.array_equal(marks * 2, np.round(marks * 2)) and np.abs(marks).max(initial=0) < 2**23:
+        return np.float32  # Half marks, and missing marks, are exact in float32
+    return np.float64
+
+
+def compact_marks(marks, dtype=None):
+    """Question columns as a single block of ``dtype`` (default :func:`mark_dtype`)."""
+    values = marks.to_numpy(dtype=float)
+    return pd.DataFrame(values.astype(dtype or mark_dtype(values)), index=marks.index, columns=marks.columns)
+
+
+def compact_frame(df, question_cols, dtype=None):
+    """``df`` with its question columns replaced by :func:`compact_marks`, column order kept."""
+    compact = pd.concat([df.drop(columns=question_cols), compact_marks(df[question_cols], dtype)], axis=1)
+    return compact[list(df.columns)]
+
+
+def add_totals(df, question_cols, max_possible):
+    """Add the 'Total' and 'Percentage' columns in place."""
+    totals = df[question_cols].to_numpy(dtype=float).sum(axis=1)
+    df['Total'] = totals.astype(mark_dtype(totals))
+    df['Percentage'] = totals / max_possible * 100
+    return df
+
+
+def parse_sheet(raw, sheet_name=0):
+    """Build an :class:`Assessment` from a sheet read with ``header=None``."""
+    header_row, total_row = find_marker_rows(raw)
+    if header_row is None:
+        raise TemplateError("Could not locate 'NAME OF LEARNER' row.")
+
+    columns = _column_labels(raw.iloc[header_row])
+    name_col = next((col for col in columns if NAME_MARKER in col.lower()), None)
+    if name_col is None:
+        raise TemplateError("Could not find 'NAME OF LEARNER' column.")
+
+    body = raw.iloc[header_row + 1:]
+    if total_row is not None and total_row > header_row:
+        body = raw.iloc[header_row + 1:total_row]
+    body = body.set_axis(columns, axis=1)
+    body = body[body[name_col].notna()].reset_index(drop=True)
+
+    name_col_idx = columns.index(name_col)
+    kept, marks = {}, {}
+    for idx, col in enumerate(columns):
+        if col == name_col:
+            kept[col] = body[col].astype(str).str.strip()
+            continue
+        values = pd.to_numeric(body[col], errors="coerce")
+        # After the name column, a column counts as a question only if every
+        # filled cell is numeric; other filled columns (e.g. 'Test Date') are kept as is
+        if idx > name_col_idx and values.notna().sum() == body[col].notna().sum():
+            marks[col] = values.fillna(0)
+            kept[col] = None
+        elif body[col].notna().any():
+            kept[col] = body[col].infer_objects()
+    question_cols = list(marks)
+    if not question_cols:
+        raise TemplateError("No numeric question columns found after 'NAME OF LEARNER'.")
+
+    # Build the frame in one go, with the marks as a single compact block
+    others = pd.DataFrame({col: values for col, values in kept.items() if values is not None}, index=body.index)
+    df = pd.concat([others, compact_marks(pd.DataFrame(marks, index=body.index))], axis=1)[list(kept)]
+    max_possible = parse_max_possible(raw, total_row)
+    add_totals(df, question_cols, max_possible)
+    return Assessment(df, name_col, question_cols, max_possible, sheet_name)
+
+
+# Cell text pandas reads as missing, plus Excel error values
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}) | frozenset(ERROR_CODES)
+END_BLANK_ROWS = 100  # Rows without a learner name that end the learner block
+_NOT_A_NUMBER = object()
+
+
+def _as_number(value):
+    """A cell value as float (as ``pd.to_numeric`` would), or ``_NOT_A_NUMBER``."""
+    if isinstance(value, (int, float)):  # Includes bool, as in pandas
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return _NOT_A_NUMBER
+
+
+def _clean(row):
+    """Row values with missing-value text as ``None`` and trailing empty cells dropped."""
+    cells = [None if isinstance(value, str) and value in NA_STRINGS else value for value in row]
+    while cells and cells[-1] is None:
+        cells.pop()
+    return cells
+
+
+def read_template(data, sheet_name=0):
+    """Stream one template sheet straight into an :class:`Assessment`.
+
+    Rows are read lazily from the sheet XML in read-only mode, values only, so
+    no cell objects are built. Marks are written into a preallocated float
+    array as they are read, and reading stops at the "TOTAAL:" row below the
+    header or after ``END_BLANK_ROWS`` rows without a learner name. Cost thus
+    follows the size of the learner block, not the formatted extent of the
+    sheet. The result matches :func:`parse_sheet` on ``pd.read_excel`` output
+    for every column within the learner block.
+    """
+    workbook = load_workbook(BytesIO(data), read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        if not hasattr(sheet, "iter_rows"):
+            raise TemplateError(f"Sheet {sheet_name!r} is not a worksheet.")
+        sheet.reset_dimensions()  # Styled workbooks often declare a far larger extent than they use
+        rows = sheet.iter_rows(values_only=True)
+
+        header = total_cells = None
+        width = 0
+        for row in rows:
+            cells = _clean(row)
+            width = max(width, len(cells))
+            for cell in cells:
+                if isinstance(cell, str):
+                    text = cell.lower()
+                    if header is None and NAME_MARKER in text:
+                        header = cells
+                    if total_cells is None and TOTAL_MARKER in text and header is None:
+                        total_cells = cells
+            if header is not None:
+                break
+        if header is None:
+            raise TemplateError("Could not locate 'NAME OF LEARNER' row.")
+        name_idx = next((i for i, col in enumerate(_column_labels(header)) if NAME_MARKER in col.lower()), None)
+        if name_idx is None:
+            raise TemplateError("Could not find 'NAME OF LEARNER' column.")
+
+        # Learner block: numbers go into ``marks``; names, columns before the
+        # name column and any non-numeric cells after it are kept as raw values
+        marks = np.full((256, max(width, 1)), np.nan)
+        names, before, other = [], [], {}
+        blank = 0
+        for row in rows:
+            cells = _clean(row)
+            if any(isinstance(cell, str) and TOTAL_MARKER in cell.lower() for cell in cells):
+                total_cells = total_cells or cells
+                break
+            name = cells[name_idx] if name_idx < len(cells) else None
+            if name is None:
+                blank += 1
+                if blank >= END_BLANK_ROWS:
+                    break
+                continue
+            blank = 0
+            n = len(names)
+            if n == len(marks):
+                marks = np.vstack([marks, np.full_like(marks, np.nan)])
+            if len(cells) > marks.shape[1]:
+                marks = np.hstack([marks, np.full((len(marks), len(cells) - marks.shape[1]), np.nan)])
+            width = max(width, len(cells))
+            names.append(name)
+            before.append(cells[:name_idx])
+            try:
+                # Fast path: numpy converts numbers, numeric text and None (as NaN) in one go
+                marks[n, name_idx + 1:len(cells)] = cells[name_idx + 1:]
+                continue
+            except (TypeError, ValueError):
+                pass
+            for j in range(name_idx + 1, len(cells)):
+                value = cells[j]
+                if value is None:
+                    continue
+                number = _as_number(value)
+                if number is _NOT_A_NUMBER:
+                    marks[n, j] = np.nan
+                    other.setdefault(j, {})[n] = value
+                else:
+                    marks[n, j] = number
+    finally:
+        workbook.close()
+
+    columns = _column_labels(list(header) + [None] * (width - len(header)))
+    name_col = columns[name_idx]
+    n = len(names)
+    marks = marks[:n]
+    kept, question = {}, {}
+    for j, col in enumerate(columns):
+        if j == name_idx:
+            kept[col] = pd.Series(names, dtype=object).astype(str).str.strip()
+        elif j < name_idx:
+            values = pd.Series([cells[j] if j < len(cells) else None for cells in before], dtype=object)
+            if values.notna().any():
+                kept[col] = values.infer_objects()
+        elif j in other:
+            # Not a question: rebuild the column from its numbers and its other values
+            values = pd.Series(marks[:, j], dtype=object).where(~np.isnan(marks[:, j]), None)
+            for i, value in other[j].items():
+                values[i] = value
+            kept[col] = values.infer_objects()
+        else:
+            question[col] = j
+            kept[col] = None
+    question_cols = list(question)
+    if not question_cols:
+        raise TemplateError("No numeric question columns found after 'NAME OF LEARNER'.")
+
+    values = np.nan_to_num(marks[:, list(question.values())], nan=0.0)
+    question_frame = pd.DataFrame(values.astype(mark_dtype(values)), columns=question_cols)
+    others = pd.DataFrame({col: values for col, values in kept.items() if values is not None}, index=question_frame.index)
+    df = pd.concat([others, question_frame], axis=1)[list(kept)]
+    max_possible = DEFAULT_MAX_POSSIBLE if total_cells is None else max_possible_from_cells(total_cells)
+    add_totals(df, question_cols, max_possible)
+    return Assessment(df, name_col, question_cols, max_possible, sheet_name)
+
+
+def _from_archive(digest, sheet_name):
+    cached = archive.load(digest, sheet_name)
+    if cached is None:
+        return None
+    df, name_col, question_cols, max_possible, class_max_possible = cached
+    assessment = Assessment(df, name_col, question_cols, max_possible, sheet_name, digest, class_max_possible)
+    datasets.put(assessment.key, assessment)
+    return assessment
+
+
+def _remember(assessment):
+    datasets.put(assessment.key, assessment)
+    archive.save(assessment)
+
+
+def load_assessment(source, sheet_name=0):
+    """Parse one template sheet from ``source``, reusing earlier results for identical bytes."""
+    data = read_bytes(source)
+    digest = content_hash(data)
+    cached = datasets.get((digest, sheet_name)) or _from_archive(digest, sheet_name)
+    if cached is not None:
+        return cached
+
+    assessment = read_template(data, sheet_name)
+    assessment.digest = digest
+    _remember(assessment)
+    return assessment
+
+
+def sheet_names(data):
+    workbook = load_workbook(BytesIO(data), read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _parse_sheet_job(data, sheet_name):
+    try:
+        return read_template(data, sheet_name)
+    except TemplateError:
+        return None
+
+
+def load_workbook_sheets(source, session=None):
+    """Parse every template sheet in a workbook, one class per sheet.
+
+    Sheets are parsed in parallel on the shared worker pool
+    (:mod:`termreport.workers`), queued for ``session``. Sheets that do not
+    follow the template are skipped.
+    """
+    data = read_bytes(source)
+    digest = content_hash(data)
+    key = (digest, "sheets")
+    cached = datasets.get(key)
+    if cached is not None:
+        return cached
+
+    futures = [pool.submit(None, _parse_sheet_job, data, name, session=session) for name in sheet_names(data)]
+    results = [future.result() for future in futures]
+
+    assessments = []
+    for assessment in results:
+        if assessment is None:
+            continue
+        assessment.digest = digest
+        _remember(assessment)
+        assessments.append(assessment)
+    if not assessments:
+        raise TemplateError("No sheet in the workbook follows the 'NAME OF LEARNER' template.")
+    datasets.put(key, assessments)
+    return assessments
+
+
+def _parse_workbook_job(data):
+    try:
+        return read_template(data)
+    except TemplateError as e:
+        return e
+
+
+def load_assessments(sources, session=None):
+    """Parse the first sheet of several workbooks, the uncached ones in parallel on the shared worker pool.
+
+    Returns one entry per source, in order: an :class:`Assessment`, or the
+    :class:`TemplateError` raised for that workbook.
+    """
+    payloads = [read_bytes(source) for source in sources]
+    digests = [content_hash(data) for data in payloads]
+    results = [datasets.get((digest, 0)) or _from_archive(digest, 0) for digest in digests]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    futures = [pool.submit(None, _parse_workbook_job, payloads[i], session=session) for i in missing]
+    parsed = [future.result() for future in futures]
+
+    for i, result in zip(missing, parsed):
+        if isinstance(result, Assessment):
+            result.digest = digests[i]
+            _remember(result)
+        results[i] = result
+    return results
+
+
+def combine(assessments):
+    """Stack per-class assessments into one frame tagged with a "Class" column.
+
+    Questions missing from a sheet are left blank (NaN) for its learners, so
+    per-question statistics only count the classes that wrote them. A
+    question column that holds text in a sheet (e.g. "abs" for an absent
+    learner) keeps that sheet's numeric marks and leaves the text blank.
+    Percentages keep the maximum marks of their own sheet, and
+    ``class_max_possible`` records each sheet's maximum; ``max_possible`` is
+    only set when all sheets agree on it.
+    """
+    first = assessments[0]
+    question_cols = list(dict.fromkeys(q for a in assessments for q in a.question_cols))
+    frames = []
+    for a in assessments:
+        frame = a.df.rename(columns={a.name_col: first.name_col})
+        text = [q for q in question_cols if q in frame.columns and q not in a.question_cols]
+        if text:
+            frame[text] = frame[text].apply(pd.to_numeric, errors="coerce")
+        frame.insert(0, CLASS_COL, str(a.sheet_name))
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True)
+    others = [col for col in df.columns if col not in question_cols and col not in ('Total', 'Percentage')]
+    df = compact_frame(df[others + question_cols + ['Total', 'Percentage']], question_cols)
+    df[CLASS_COL] = df[CLASS_COL].astype("category")
+    class_max_possible = {str(a.sheet_name): a.max_possible for a in assessments}
+    max_possible = first.max_possible if len(set(class_max_possible.values())) == 1 else None
+    return Assessment(df, first.name_col, question_cols, max_possible, "*", first.digest, class_max_possible)
+
+
+def load_batch(source, session=None):
+    """Parse all template sheets and return them as one combined :class:`Assessment`."""
+    digest = content_hash(read_bytes(source))
+    cached = datasets.get((digest, "*")) or _from_archive(digest, "*")
+    if cached is not None:
+        return cached
+    assessment = combine(load_workbook_sheets(source, session))
+    _remember(assessment)
+    return assessment
@@ -0,0 +1,116 @@
+"""Class-level analysis shared by the dashboard and the Word report."""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from termreport.ingest import CLASS_COL
+
+
+def class_summary(df):
+    """One row per class: learner count, average and spread of Percentage."""
+    if CLASS_COL not in df.columns:
+        return pd.DataFrame()
+    summary = df.groupby(CLASS_COL, observed=True, sort=False)['Percentage'].agg(
+        Learners='size', Average='mean', Lowest='min', Highest='max'
+    )
+    return summary.reset_index()
+
+
+def format_class_summary(summary):
+    """Round the summary for display in ``st.table`` and the docx."""
+    if summary.empty:
+        return summary
+    formatted = summary.copy()
+    for col in ['Average', 'Lowest', 'Highest']:
+        formatted[col] = formatted[col].map(lambda v: f"{v:.1f}%")
+    formatted['Learners'] = formatted['Learners'].astype(str)
+    return formatted
+
+
+TIERS = ["Needs Improvement", "Average", "Excelling"]
+TIER_BINS = [-np.inf, 30, 70, np.inf]  # [0, 30) needs improvement, [30, 70) average, 70+ excelling
+LEARNER_COLUMNS = ["Learner", "Percentage", "Strong Questions", "Weak Questions"]
+
+
+@dataclass
+class Insights:
+    avg_percentage: float
+    active_questions: list
+    active_means: pd.Series
+    avg_question_mean: float = None
+    weak_questions: list = field(default_factory=list)
+    tiers: pd.Series = None
+    above_mean: pd.DataFrame = None
+    below_mean: pd.DataFrame = None
+    learner_performance: dict = field(default_factory=dict)
+    recommendations: list = field(default_factory=list)
+
+
+def active_question_cols(df, question_cols):
+    """Questions with at least one mark entered."""
+    return [q for q in question_cols if df[q].sum() > 0]
+
+
+def assign_tiers(percentage):
+    return pd.cut(percentage, bins=TIER_BINS, labels=TIERS, right=False)
+
+
+def _join_flagged(flags, labels):
+    # One comma-separated string of question labels per row of a boolean matrix
+    return [', '.join(labels[row]) or "None" for row in flags]
+
+
+def learner_tables(df, name_col, tiers, above, below):
+    """Per-tier tables of learners with their strong and weak questions."""
+    labels = np.asarray(above.columns, dtype=object)
+    table = pd.DataFrame({
+        "Learner": df[name_col].to_numpy(),
+        "Percentage": df['Percentage'].map(lambda p: f"{p:.1f}%").to_numpy(),
+        "Strong Questions": _join_flagged(above.to_numpy(), labels),
+        "Weak Questions": _join_flagged(below.to_numpy(), labels),
+    })
+    tier_values = tiers.to_numpy()
+    return {tier: table[tier_values == tier].reset_index(drop=True) for tier in TIERS}
+
+
+def analyse(df, name_col, question_cols, means=None, tiers=None):
+    """Compute the class insights, learner tiers and recommendations.
+
+    ``means`` (per question) and ``tiers`` (per learner) may be passed when
+    already known, e.g. kept up to date by :class:`~termreport.editing.MarkSheet`.
+    """
+    if means is None:
+        active_questions = active_question_cols(df, question_cols)
+        active_means = df[active_questions].mean()
+    else:
+        active_questions = [q for q in question_cols if means[q] > 0]
+        active_means = means[active_questions].astype(float)
+    result = Insights(df['Percentage'].mean(), active_questions, active_means)
+    learner_performance = {tier: pd.DataFrame(columns=LEARNER_COLUMNS) for tier in TIERS}
+
+    if active_questions:
+        result.avg_question_mean = active_means.mean()
+        result.weak_questions = active_means[active_means < result.avg_question_mean * 0.7].index.tolist()
+
+        # Learner vs. question-mean comparison as one boolean matrix each way
+        marks = df[active_questions].to_numpy()
+        means = active_means.to_numpy()
+        result.above_mean = pd.DataFrame(marks > means, index=df.index, columns=active_questions)
+        result.below_mean = pd.DataFrame(marks < means, index=df.index, columns=active_questions)
+        result.tiers = assign_tiers(df['Percentage']) if tiers is None else tiers
+        learner_performance = learner_tables(df, name_col, result.tiers, result.above_mean, result.below_mean)
+    result.learner_performance = learner_performance
+
+    recommendations = ["### Recommendations"]
+    if not learner_performance["Needs Improvement"].empty:
+        recommendations.append("- Organize remedial sessions for 'Needs Improvement' learners.")
+    if not learner_performance["Excelling"].empty:
+        recommendations.append("- Provide advanced challenges for 'Excelling' learners.")
+    if active_questions:
+        weakest_question = active_means.idxmin()
+        strongest_question = active_means.idxmax()
+        recommendations.append(f"- Focus class revision on **{weakest_question}** (lowest average: {active_means[weakest_question]:.1f}).")
+        recommendations.append(f"- Note strong performance in **{strongest_question}** (highest average: {active_means[strongest_question]:.1f}).")
+    result.recommendations = recommendations
+    return result
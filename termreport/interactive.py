@@ -0,0 +1,115 @@
+"""Plotly versions of the dashboard charts.
+
+These are sent to the browser as JSON specs and drawn client-side, so the
+server does no rasterising. The matplotlib charts in :mod:`termreport.charts`
+are still used for the Word report.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from termreport.charts import EXTREMES_N, extremes, performance_bands
+
+PRIMARY = '#003366'
+
+
+def _style(fig, title):
+    fig.update_layout(title={'text': title, 'font': {'color': PRIMARY}})
+    return fig
+
+
+def percentage_per_learner(df, name_col):
+    fig = px.bar(df, x='Percentage', y=name_col, orientation='h', color='Percentage',
+                 color_continuous_scale='Blues', labels={'Percentage': 'Percentage (%)', name_col: 'Learner'})
+    fig.update_traces(marker_line_color=PRIMARY, marker_line_width=1)
+    fig.update_layout(height=max(400, len(df) * 22), yaxis={'autorange': 'reversed'}, coloraxis_showscale=False)
+    return _style(fig, "Percentage per Learner")
+
+
+def total_marks(df, name_col, chart_type):
+    labels = {'Total': 'Total Marks', name_col: 'Learner'}
+    if chart_type == "Scatter Plot":
+        fig = px.scatter(df, x=name_col, y='Total', labels=labels, color_discrete_sequence=[PRIMARY])
+        fig.update_traces(marker={'size': 12, 'line': {'color': 'black', 'width': 1}})
+        return _style(fig, "Total Marks per Learner")
+    if chart_type == "Box Plot":
+        fig = px.box(df, y='Total', labels=labels, points='all', hover_data=[name_col],
+                     color_discrete_sequence=[PRIMARY])
+        return _style(fig, "Distribution of Total Marks")
+    fig = px.bar(df, x=name_col, y='Total', labels=labels, color='Total', color_continuous_scale='Blues')
+    fig.update_layout(xaxis={'tickangle': 90}, coloraxis_showscale=False)
+    return _style(fig, "Total Marks per Learner")
+
+
+def marks_breakdown(df, name_col, question_cols):
+    fig = px.bar(df, x=name_col, y=question_cols, barmode='stack',
+                 labels={name_col: 'Learner', 'value': 'Marks', 'variable': 'Questions'},
+                 color_discrete_sequence=px.colors.colorbrewer.Paired)
+    fig.update_layout(xaxis={'tickangle': 90})
+    return _style(fig, "Marks Breakdown by Learner and Question")
+
+
+def question_averages(active_means):
+    fig = px.bar(x=active_means.index, y=active_means.values, labels={'x': 'Question', 'y': 'Average Mark'},
+                 color=active_means.values, color_continuous_scale='Greens')
+    fig.update_layout(xaxis={'tickangle': -45}, coloraxis_showscale=False)
+    return _style(fig, "Average Marks per Question")
+
+
+def question_distribution(marks, question):
+    question_data = marks.value_counts()
+    fig = px.pie(values=question_data.values, names=[str(mark) for mark in question_data.index],
+                 color_discrete_sequence=px.colors.qualitative.Set2)
+    fig.update_traces(textinfo='percent', marker={'line': {'color': 'white', 'width': 1}}, sort=False)
+    fig.update_layout(legend_title_text="Marks")
+    return _style(fig, f"Distribution of Marks for {question}")
+
+
+def percentage_histogram(df):
+    fig = px.histogram(df, x='Percentage', labels={'Percentage': 'Percentage (%)'},
+                       color_discrete_sequence=['#4A90C2'])
+    fig.update_traces(xbins={'start': 0, 'end': 100, 'size': 10}, marker_line_color=PRIMARY, marker_line_width=1)
+    for q, value in df['Percentage'].quantile(np.arange(0.1, 1.0, 0.1).round(1)).items():
+        fig.add_vline(x=value, line_dash='dash', line_color='#D32F2F' if q == 0.5 else '#555555',
+                      line_width=2 if q == 0.5 else 1)
+    fig.update_layout(yaxis_title="Learners", bargap=0.05)
+    return _style(fig, f"Percentage Distribution of {len(df)} Learners (deciles dashed, median red)")
+
+
+def top_bottom_learners(df, name_col, n=EXTREMES_N):
+    top, bottom = extremes(df, n)
+    ranked = pd.concat([top.assign(Group=f"Top {len(top)}"), bottom.assign(Group=f"Bottom {len(bottom)}")])
+    fig = px.bar(ranked, x='Percentage', y=name_col, orientation='h', color='Group',
+                 color_discrete_sequence=['#4A90C2', '#E57373'],
+                 labels={'Percentage': 'Percentage (%)', name_col: 'Learner', 'Group': ''})
+    fig.update_layout(height=max(400, len(ranked) * 22), yaxis={'autorange': 'reversed'})
+    return _style(fig, f"Top and Bottom {n} Learners")
+
+
+def band_heatmap(df, question_cols):
+    means = performance_bands(df, question_cols)
+    fig = px.imshow(means, color_continuous_scale='Blues', aspect='auto',
+                    text_auto='.1f' if len(question_cols) <= 20 else False,
+                    labels={'x': 'Question', 'y': means.index.name, 'color': 'Average Mark'})
+    return _style(fig, "Average Marks per Question by Performance Band")
+
+
+def draw_chart(kind, df, name_col=None, question_cols=None, chart_type=None, question=None, means=None):
+    """Plotly counterpart of :func:`termreport.charts.draw_chart`."""
+    if kind == 'percentage':
+        return percentage_per_learner(df, name_col)
+    if kind == 'total':
+        return total_marks(df, name_col, chart_type)
+    if kind == 'breakdown':
+        return marks_breakdown(df, name_col, question_cols)
+    if kind == 'question_averages':
+        return question_averages(means)
+    if kind == 'distribution':
+        return question_distribution(df[question], question)
+    if kind == 'percentage_histogram':
+        return percentage_histogram(df)
+    if kind == 'extremes':
+        return top_bottom_learners(df, name_col)
+    if kind == 'heatmap':
+        return band_heatmap(df, question_cols)
+    raise ValueError(f"Unknown chart kind: {kind}")
@@ -0,0 +1,138 @@
+"""Classical item analysis over the learner x question mark matrix.
+
+Every statistic is computed with whole-matrix numpy operations, so a grade
+of thousands of learners and hundreds of sub-questions takes milliseconds.
+Questions some learners have no mark for (not written by every class of a
+combined batch) are left out, as alpha needs a complete mark matrix.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+GROUP_FRACTION = 0.27  # Share of learners in the upper and lower discrimination groups
+ITEM_COLUMNS = ['Max', 'Mean', 'Facility', 'Discrimination', 'Point-Biserial', 'Item-Rest r', 'Alpha if Deleted', 'Flag']
+
+# Facility below HARD / above EASY, discrimination below POOR_DISCRIMINATION
+HARD = 0.3
+EASY = 0.9
+POOR_DISCRIMINATION = 0.2
+
+
+@dataclass
+class ItemAnalysis:
+    items: pd.DataFrame  # One row per question, columns ITEM_COLUMNS
+    alpha: float  # Cronbach's alpha of the whole test
+    learners: int
+    skipped: list = field(default_factory=list)  # Questions some learners have no mark for
+
+    @property
+    def note(self):
+        """A sentence naming the skipped questions, or ""."""
+        return f" Left out as not every class wrote them: {', '.join(map(str, self.skipped))}." if self.skipped else ""
+
+    @property
+    def flagged(self):
+        return self.items[self.items['Flag'] != ""]
+
+
+def _column_corr(centered, other):
+    """Pearson correlation of every column of ``centered`` with the matching column of ``other``."""
+    other = other - other.mean(axis=0)
+    numerator = (centered * other).sum(axis=0)
+    denominator = np.sqrt((centered ** 2).sum(axis=0) * (other ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _flags(facility, discrimination, item_rest):
+    flags = np.full(facility.shape, "", dtype=object)
+    flags[facility > EASY] = "Very easy"
+    flags[facility < HARD] = "Very hard"
+    weak = discrimination < POOR_DISCRIMINATION
+    flags[weak] = np.where(flags[weak] == "", "Poor discrimination", flags[weak] + ", poor discrimination")
+    negative = item_rest < 0
+    flags[negative] = np.where(flags[negative] == "", "Negative item-rest r", flags[negative] + ", negative item-rest r")
+    return flags
+
+
+def item_analysis(df, question_cols, question_max=None):
+    """Facility, discrimination, point-biserial and item-rest correlations, and Cronbach's alpha.
+
+    ``question_max`` maps questions to their maximum mark; questions without
+    one are normalized by the highest mark any learner obtained.
+
+    * Facility: mean mark as a fraction of the question's maximum.
+    * Discrimination: difference between the upper and lower 27% of learners
+      (ranked by total) in mean mark, as a fraction of the maximum.
+    * Point-biserial: correlation of the question with the total mark.
+    * Item-rest r: correlation with the total of the other questions.
+    * Alpha if Deleted: Cronbach's alpha of the test without the question.
+
+    These need every learner's mark on every question, so questions missing
+    for some learners (not written by their class, in a combined batch) are
+    left out and listed in ``skipped``.
+    """
+    written = df[question_cols].notna().all().to_numpy()
+    skipped = [q for q, complete in zip(question_cols, written) if not complete]
+    question_cols = [q for q, complete in zip(question_cols, written) if complete]
+    marks = df[question_cols].to_numpy(dtype=float)
+    n, k = marks.shape
+    observed_max = marks.max(axis=0, initial=0)
+    maxima = pd.Series(question_max or {}, dtype=float).reindex(question_cols).fillna(
+        pd.Series(observed_max, index=question_cols)).to_numpy()
+    safe_max = np.where(maxima > 0, maxima, np.nan)
+
+    totals = marks.sum(axis=1)
+    means = marks.mean(axis=0)
+    facility = means / safe_max
+
+    group = max(1, int(round(n * GROUP_FRACTION)))
+    order = np.argsort(totals, kind='stable')
+    discrimination = (marks[order[-group:]].mean(axis=0) - marks[order[:group]].mean(axis=0)) / safe_max
+
+    centered = marks - means
+    point_biserial = _column_corr(centered, totals[:, None])
+    item_rest = _column_corr(centered, totals[:, None] - marks)
+
+    # Cronbach's alpha and alpha without each item, from the item variances
+    # and the covariance of each item with the total
+    item_var = marks.var(axis=0, ddof=1) if n > 1 else np.full(k, np.nan)
+    total_var = totals.var(ddof=1) if n > 1 else np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        alpha = k / (k - 1) * (1 - item_var.sum() / total_var) if k > 1 and total_var > 0 else np.nan
+        cov_total = (centered * (totals - totals.mean())[:, None]).sum(axis=0) / max(n - 1, 1)
+        rest_var = total_var + item_var - 2 * cov_total
+        alpha_deleted = np.where((rest_var > 0) & (k > 2),
+                                 (k - 1) / max(k - 2, 1) * (1 - (item_var.sum() - item_var) / rest_var), np.nan)
+
+    items = pd.DataFrame({
+        'Max': maxima,
+        'Mean': means,
+        'Facility': facility,
+        'Discrimination': discrimination,
+        'Point-Biserial': point_biserial,
+        'Item-Rest r': item_rest,
+        'Alpha if Deleted': alpha_deleted,
+        'Flag': _flags(facility, discrimination, item_rest),
+    }, index=pd.Index(question_cols, name='Question'))
+    return ItemAnalysis(items, float(alpha), n, skipped)
+
+
+def alpha_rating(alpha):
+    """Conventional reading of a reliability coefficient."""
+    if np.isnan(alpha):
+        return "not available"
+    for threshold, label in [(0.9, "excellent"), (0.8, "good"), (0.7, "acceptable"), (0.6, "questionable"), (0.5, "poor")]:
+        if alpha >= threshold:
+            return label
+    return "unacceptable"
+
+
+def format_items(analysis):
+    """The item table with values rounded for display, one string per cell."""
+    table = analysis.items.reset_index()
+    numeric = ITEM_COLUMNS[:-1]
+    table[numeric] = table[numeric].map(lambda value: "–" if pd.isna(value) else f"{value:.2f}")
+    table['Max'] = analysis.items['Max'].map(lambda value: f"{value:g}").to_numpy()
+    return table
@@ -0,0 +1,83 @@
+"""Background report generation shared by all dashboard sessions.
+
+Reports are coordinated from a small thread pool, so a click never blocks
+the session's script thread and concurrent requests queue instead of piling
+up; the rendering and assembly themselves run on the shared worker processes
+(:mod:`termreport.workers`).
+Identical requests (same data fingerprint and report settings) share one job,
+and finished documents are kept in a size-bounded cache so repeat downloads
+are immediate.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from termreport.cache import ByteCache
+from termreport.timing import server
+
+REPORT_WORKERS = int(os.environ.get("TERMREPORT_REPORT_WORKERS", 2))
+REPORT_CACHE_BYTES = 128 * 1024 * 1024
+
+
+class ReportJob:
+    def __init__(self, key):
+        self.key = key
+        self.fraction = 0.0
+        self.section = "Queued"
+        self.future = None
+
+    def update(self, fraction, section):
+        self.fraction = fraction
+        self.section = section
+
+    def done(self):
+        return self.future.done()
+
+    def error(self):
+        return self.future.exception() if self.done() else None
+
+
+class ReportJobs:
+    def __init__(self, workers=REPORT_WORKERS, cache_bytes=REPORT_CACHE_BYTES):
+        self.results = ByteCache(cache_bytes)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def result(self, key):
+        """The finished document bytes for ``key``, or ``None``."""
+        return self.results.get(key)
+
+    def job(self, key):
+        """The queued or running job for ``key``, or ``None``."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def submit(self, key, build, *args, **kwargs):
+        """Start ``build(*args, progress=..., **kwargs)`` unless the same report is already underway.
+
+        ``build`` must return a file-like object holding the document.
+        """
+        with self._lock:
+            if key in self._jobs:
+                return self._jobs[key]
+            job = ReportJob(key)
+            self._jobs[key] = job
+            job.future = self._pool.submit(self._run, job, build, args, kwargs)
+            return job
+
+    def discard(self, key):
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def _run(self, job, build, args, kwargs):
+        # An exception ends up in the future and the failed job stays listed,
+        # so sessions can show the error until it is discarded
+        with server.span("report build", builder=build.__name__):
+            stream = build(*args, progress=job.update, **kwargs)
+        self.results.put(job.key, stream.getvalue())
+        with self._lock:
+            self._jobs.pop(job.key, None)
+
+
+report_jobs = ReportJobs()
@@ -0,0 +1,157 @@
+"""Learner progress across many assessments.
+
+:class:`ProgressHistory` keeps one entry per assessment (a parsed sheet, or
+each test date within a sheet that has a 'Test Date' column). Learners are
+aligned across assessments by ID column when the sheet has one, otherwise by
+normalized name, and questions by normalized label. Adding an assessment
+only processes that assessment; trends are answered from per-assessment
+aggregates and a lazily rebuilt (learner, assessment, question) index.
+"""
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+
+DATE_COL = 'Test Date'
+ID_LABELS = ("learner id", "id", "admin no", "admission no", "admin number")
+
+
+@dataclass
+class AssessmentInfo:
+    key: tuple
+    label: str
+    date: pd.Timestamp = None
+    max_possible: int = None  # None for a batch whose classes have different maxima
+    learners: int = 0
+    source: tuple = None  # Key of the dataset version the entry was computed from
+
+
+def normalize_label(text):
+    return re.sub(r"\s+", " ", str(text)).strip().upper()
+
+
+def id_column(df):
+    return next((col for col in df.columns if str(col).strip().lower() in ID_LABELS), None)
+
+
+def learner_keys(df, name_col):
+    """Alignment key per row: the ID column if present, else the normalized name."""
+    col = id_column(df)
+    if col is not None and df[col].notna().all():
+        return df[col].astype(str).str.strip()
+    return df[name_col].map(normalize_label)
+
+
+class ProgressHistory:
+    def __init__(self):
+        self.assessments = {}
+        self.names = {}
+        self._marks = {}
+        self._question_means = {}
+        self._percentages = {}
+        self._index = None
+
+    def __len__(self):
+        return len(self.assessments)
+
+    def __contains__(self, key):
+        return any(k[:len(key)] == key for k in self.assessments)
+
+    def _unique_label(self, label):
+        taken = {info.label.split(" (")[0] for info in self.assessments.values()}
+        candidate, n = label, 1
+        while candidate in taken:
+            n += 1
+            candidate = f"{label} #{n}"
+        return candidate
+
+    def add(self, assessment, label=None, key=None):
+        """Add a parsed :class:`~termreport.ingest.Assessment`; does nothing if it is already present.
+
+        ``key`` files it under another key than its own: a corrected version
+        of an upload (:class:`~termreport.editing.MarkSheet`) is added under
+        the upload's key and replaces the earlier version in place, keeping
+        its label and position. A sheet with a 'Test Date' column becomes one
+        assessment per date. Returns the keys that were added.
+        """
+        key = assessment.key if key is None else key
+        previous = [k for k in self.assessments if k[:len(key)] == key]
+        if previous:
+            if self.assessments[previous[0]].source == assessment.key:
+                return []
+            label = self.assessments[previous[0]].label.split(" (")[0]
+        else:
+            label = self._unique_label(label or str(assessment.sheet_name))
+        base_key = key
+        df = assessment.df
+        keys = learner_keys(df, assessment.name_col)
+        questions = {q: normalize_label(q) for q in assessment.question_cols}
+
+        if DATE_COL in df.columns:
+            dates = pd.to_datetime(df[DATE_COL], errors='coerce')
+            groups = [(date, dates == date) for date in dates.dropna().unique()]
+        else:
+            groups = [(None, pd.Series(True, index=df.index))]
+
+        added = []
+        for date, rows in groups:
+            key = base_key + (date,)
+            part = df.loc[rows, assessment.question_cols].rename(columns=questions)
+            part.index = keys[rows].to_numpy()
+            self.names.update(zip(keys[rows], df.loc[rows, assessment.name_col]))
+
+            self._question_means[key] = part.mean()
+            self._percentages[key] = df.loc[rows, 'Percentage'].set_axis(part.index).groupby(level=0).mean()
+            # Learners sharing a key within one test cannot be told apart; keep their average
+            part = part.groupby(level=0, sort=False).mean()
+            marks = part.stack()
+            marks.index.names = ['learner', 'question']
+            self._marks[key] = marks
+            entry_label = label if date is None else f"{label} ({pd.Timestamp(date):%Y-%m-%d})"
+            self.assessments[key] = AssessmentInfo(key, entry_label, date, assessment.max_possible, len(part),
+                                                   source=assessment.key)
+            added.append(key)
+        for key in set(previous) - set(added):
+            # A test date that no longer has learners
+            for entries in (self.assessments, self._marks, self._question_means, self._percentages):
+                del entries[key]
+        self._index = None
+        return added
+
+    def ordered(self):
+        """Assessments in date order; undated ones keep the order they were added, after dated ones."""
+        position = {key: i for i, key in enumerate(self.assessments)}
+        return sorted(self.assessments.values(),
+                      key=lambda info: (info.date is None, info.date or pd.Timestamp.min, position[info.key]))
+
+    @property
+    def marks(self):
+        """All marks as a Series indexed by (learner, assessment label, question), sorted for fast lookups."""
+        if self._index is None:
+            infos = self.ordered()
+            self._index = pd.concat(
+                [self._marks[info.key] for info in infos],
+                keys=[info.label for info in infos],
+                names=['assessment'],
+            ).reorder_levels(['learner', 'assessment', 'question']).sort_index()
+        return self._index
+
+    def question_trend(self, questions=None):
+        """Class average per question, one row per assessment."""
+        infos = self.ordered()
+        trend = pd.DataFrame([self._question_means[info.key] for info in infos],
+                             index=pd.Index([info.label for info in infos], name='Assessment'))
+        return trend if questions is None else trend.reindex(columns=[normalize_label(q) for q in questions])
+
+    def learner_trend(self, learner):
+        """A learner's percentage per assessment they wrote."""
+        rows = [(info.label, self._percentages[info.key].get(learner)) for info in self.ordered()]
+        return pd.DataFrame(rows, columns=['Assessment', 'Percentage']).dropna().reset_index(drop=True)
+
+    def learner_question_trend(self, learner, questions=None):
+        """A learner's mark per question (columns) per assessment (rows)."""
+        if learner not in self.marks.index.get_level_values(0):
+            return pd.DataFrame()
+        trend = self.marks.xs(learner, level='learner').unstack('question')
+        trend = trend.reindex([info.label for info in self.ordered()]).dropna(how='all')
+        return trend if questions is None else trend.reindex(columns=[normalize_label(q) for q in questions])
@@ -0,0 +1,206 @@
+"""Word (.docx) report assembly."""
+from concurrent.futures import as_completed
+from datetime import date
+from io import BytesIO
+
+from docx import Document
+from docx.shared import Inches, Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from termreport import charts
+from termreport.insights import analyse, class_summary, format_class_summary
+from termreport.items import alpha_rating, format_items, item_analysis
+from termreport.workers import pool
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PICTURE_WIDTH = 5.5  # inches
+# Export image quality -> target DPI for embedded charts (None keeps the cached PNG as is)
+IMAGE_QUALITY = {"Standard": None, "Compact": 96}
+OVERVIEW_CHARTS = 3  # Figures in the Performance Overview section
+RENDER_SHARE = 0.8  # Share of render_report progress spent on charts, before assembly
+
+
+def add_table(doc, header, rows):
+    table = doc.add_table(rows=len(rows) + 1, cols=len(header))
+    table.style = 'Table Grid'
+    # Walk the rows once: indexing table.rows[i].cells rebuilds the cell grid on every access
+    for row, values in zip(table.rows, [header] + rows):
+        for cell, value in zip(row.cells, values):
+            cell.text = str(value)
+    return table
+
+
+def report_charts(df, selected_chart, insights):
+    """The charts a report embeds, in order, as ``(kind, params, caption)``.
+
+    The first ``OVERVIEW_CHARTS`` belong to the Performance Overview, the rest
+    to the Question Analysis.
+    """
+    if charts.is_large_class(df):
+        # One mark per learner would make these figures unreadable; summarise the class instead
+        overview = [
+            ('percentage_histogram', {}, "Percentage Distribution"),
+            ('extremes', {}, f"Top and Bottom {charts.EXTREMES_N} Learners"),
+            ('heatmap', {}, "Average Marks per Question by Performance Band"),
+        ]
+    else:
+        overview = [
+            ('percentage', {}, "Average Percentage per Learner"),
+            ('total', {'chart_type': selected_chart}, f"Total Marks per Learner ({selected_chart})"),
+            ('breakdown', {}, "Marks Breakdown by Learner and Question"),
+        ]
+    questions = []
+    if insights.active_questions:
+        questions.append(('question_averages', {'means': insights.active_means}, "Average Marks per Question"))
+        questions += [('distribution', {'question': question}, f"Distribution of Marks for {question}")
+                      for question in insights.active_questions]
+    return [(kind, params, f"Figure {i}: {caption}")
+            for i, (kind, params, caption) in enumerate(overview + questions, 1)]
+
+
+def _picture_key(kind, params):
+    return kind, params.get('chart_type'), params.get('question')
+
+
+def build_report(df, name_col, question_cols, selected_chart="Vertical Bar",
+                 insights=None, items=None, hashes=None, class_table=None, generated_on=None,
+                 image_quality="Standard", pictures=None, progress=None):
+    """Assemble the full learner performance report and return it as a ``BytesIO``.
+
+    Charts come from ``pictures`` (PNG bytes collected by
+    :func:`render_report`) or the shared chart cache, so figures already shown
+    on the dashboard are embedded without being drawn again. ``image_quality``
+    "Compact" downsamples them for a smaller file. ``progress``, if given, is
+    called as ``progress(fraction, section)`` as each section is assembled.
+    """
+    if insights is None:
+        insights = analyse(df, name_col, question_cols)
+    if class_table is None:
+        class_table = format_class_summary(class_summary(df))
+    hashes = hashes or charts.column_hashes(df)
+    generated_on = generated_on or date.today()
+    active_questions = insights.active_questions
+    if items is None and active_questions:
+        items = item_analysis(df, active_questions)
+    image_dpi = IMAGE_QUALITY[image_quality]
+    figures = report_charts(df, selected_chart, insights)
+
+    doc = Document()
+    # One step per embedded chart, plus the item analysis, the insights tables and saving
+    steps = len(figures) + (1 if active_questions else 0) + 2
+    done = 0
+
+    def advance(section):
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done / steps, section)
+
+    def add_figures(figures, section):
+        for kind, params, caption in figures:
+            png = (pictures or {}).get(_picture_key(kind, params))
+            if png is None:
+                png = charts.chart_png(kind, df, name_col, question_cols, hashes=hashes, **params)
+            if image_dpi:
+                png = charts.compact_png(png, PICTURE_WIDTH, image_dpi)
+            doc.add_picture(BytesIO(png), width=Inches(PICTURE_WIDTH))
+            doc.add_paragraph(caption, style='Caption')
+            advance(section)
+
+    # Title Page
+    doc.add_heading('Learner Performance Report', 0).alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph('Saul Damon High School', style='Subtitle').alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph(f"Generated on {generated_on:%B %d, %Y}", style='Subtitle').alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_page_break()
+
+    # Performance Overview
+    doc.add_heading('Performance Overview', level=1)
+    if not class_table.empty:
+        doc.add_paragraph("Class Summary", style='Heading 2')
+        add_table(doc, list(class_table.columns), list(class_table.itertuples(index=False)))
+    add_figures(figures[:OVERVIEW_CHARTS], "Performance Overview")
+
+    # Question Analysis
+    doc.add_heading('Question Analysis', level=1)
+    if active_questions:
+        add_figures(figures[OVERVIEW_CHARTS:], "Question Analysis")
+
+        doc.add_paragraph("Item Analysis", style='Heading 2')
+        doc.add_paragraph(f"Cronbach's alpha is {items.alpha:.2f} ({alpha_rating(items.alpha)} reliability) "
+                          f"over {items.learners} learners and {len(items.items)} questions.{items.note} Facility is the "
+                          "average mark as a share of the question's maximum; discrimination compares the top and "
+                          "bottom 27% of learners.")
+        item_table = format_items(items)
+        table = add_table(doc, list(item_table.columns), list(item_table.itertuples(index=False)))
+        for row in table.rows:
+            for cell in row.cells:
+                cell.paragraphs[0].runs[0].font.size = Pt(8)
+        advance("Item Analysis")
+
+    # Insights and Recommendations
+    doc.add_heading('Insights and Recommendations', level=1)
+    doc.add_paragraph("Insights", style='Heading 2')
+    doc.add_paragraph(f"The class average percentage is {insights.avg_percentage:.2f}%.", style='List Bullet')
+    if active_questions and insights.weak_questions:
+        doc.add_paragraph(f"Weak questions (below 70% of mean {insights.avg_question_mean:.1f}): {', '.join(insights.weak_questions)}.", style='List Bullet')
+
+    for tier, learners in insights.learner_performance.items():
+        if not learners.empty:
+            doc.add_paragraph(f"{tier} ({len(learners)} learners)", style='Heading 3')
+            table = add_table(doc, list(learners.columns), list(learners.itertuples(index=False)))
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.paragraphs[0].runs[0].font.size = Pt(10)
+
+    advance("Insights and Recommendations")
+
+    doc.add_paragraph("Recommendations", style='Heading 2')
+    for recommendation in insights.recommendations:
+        if recommendation.startswith("###"):
+            doc.add_paragraph(recommendation.replace("### ", ""), style='Heading 3')
+        else:
+            doc.add_paragraph(recommendation.replace('**', ''), style='List Bullet')
+
+    doc_stream = BytesIO()
+    doc.save(doc_stream)
+    doc_stream.seek(0)
+    advance("Saving document")
+    return doc_stream
+
+
+def _assemble(builder, *args, **kwargs):
+    # Worker-process entry point: return bytes rather than a BytesIO
+    return builder(*args, **kwargs).getvalue()
+
+
+def render_report(df, name_col, question_cols, selected_chart="Vertical Bar",
+                  insights=None, items=None, hashes=None, class_table=None, generated_on=None,
+                  image_quality="Standard", builder=build_report, session=None, progress=None):
+    """Build the report on the shared worker pool and return it as a ``BytesIO``.
+
+    Missing charts are rendered in parallel, then the document is assembled
+    in a worker from the finished images by ``builder``: :func:`build_report`,
+    or :func:`termreport.export.build_class_pdf` for a PDF. Other arguments
+    are as for :func:`build_report`; ``session`` identifies the requesting
+    session to the pool.
+    """
+    if insights is None:
+        insights = analyse(df, name_col, question_cols)
+    hashes = hashes or charts.column_hashes(df)
+    futures = {_picture_key(kind, params): charts.submit_png(kind, df, name_col, question_cols,
+                                                             hashes=hashes, session=session, **params)
+               for kind, params, _ in report_charts(df, selected_chart, insights)}
+    for i, _ in enumerate(as_completed(futures.values()), 1):
+        if progress is not None:
+            progress(RENDER_SHARE * i / len(futures), "Rendering charts")
+    pictures = {key: future.result() for key, future in futures.items()}
+
+    def assembly_progress(fraction, section):
+        progress(RENDER_SHARE + (1 - RENDER_SHARE) * fraction, section)
+
+    # The builder's per-section progress is relayed from the worker
+    data = pool.run(None, _assemble, builder, df, name_col, question_cols, selected_chart,
+                    insights=insights, items=items, hashes=hashes, class_table=class_table,
+                    generated_on=generated_on, image_quality=image_quality, pictures=pictures,
+                    session=session, progress=None if progress is None else assembly_progress)
+    return BytesIO(data)
@@ -0,0 +1,130 @@
+"""Indexed learner search for large rosters.
+
+A :class:`LearnerIndex` is built once per dataset, as part of its
+:class:`~termreport.cube.StatsCube`. Every word of every name is normalized
+(case and accents ignored) and kept in one sorted array, so a prefix search
+is a binary search instead of a scan of the roster; words with no prefix
+match fall back to fuzzy matching against the distinct words. Filters by
+tier, class and percentage range are vectorized masks, and results are row
+positions, shown a page at a time.
+"""
+import difflib
+import re
+import unicodedata
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from termreport.ingest import CLASS_COL
+from termreport.insights import assign_tiers
+
+RESULTS_PER_PAGE = 50  # Search results per page
+FUZZY_MATCHES = 5  # Close words tried per unmatched query word
+FUZZY_CUTOFF = 0.75
+WORD = re.compile(r"[^\W_]+")
+LEARNER_NUMBER = re.compile(r"#?\s*(\d+)")  # Row number in the roster, from 1
+
+
+def normalize(text):
+    """Lower-case ``text`` and strip accents, so "Zoë" and "zoe" match."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+@dataclass
+class LearnerIndex:
+    names: np.ndarray
+    percentage: np.ndarray
+    tiers: np.ndarray  # Tier label per learner
+    classes: np.ndarray  # Class per learner, or None for a single class
+    words: np.ndarray  # Every normalized name word, sorted
+    word_rows: np.ndarray  # Row position of each entry of ``words``
+    vocabulary: list  # Distinct words, for fuzzy matching
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def class_names(self):
+        return [] if self.classes is None else list(dict.fromkeys(self.classes))
+
+    @property
+    def nbytes(self):
+        labels = [self.names, self.tiers] + ([self.classes] if self.classes is not None else [])
+        return int(self.words.nbytes + self.word_rows.nbytes + self.percentage.nbytes
+                   + sum(pd.Series(values).memory_usage(deep=True) for values in labels))
+
+    def _rows(self, word, prefix=True):
+        # Row positions of the words starting with (or equal to) ``word``
+        start = np.searchsorted(self.words, word, 'left')
+        stop = np.searchsorted(self.words, word + "\U0010ffff", 'left') if prefix else \
+            np.searchsorted(self.words, word, 'right')
+        return np.unique(self.word_rows[start:stop])
+
+    def _word_rows(self, word):
+        """Rows with a name word starting with ``word``, or close to it; and whether the match was fuzzy."""
+        rows = self._rows(word)
+        if rows.size or word.isdigit():
+            return rows, False
+        close = difflib.get_close_matches(word, self.vocabulary, n=FUZZY_MATCHES, cutoff=FUZZY_CUTOFF)
+        rows = [self._rows(match, prefix=False) for match in close]
+        return (np.unique(np.concatenate(rows)) if rows else np.array([], dtype=np.intp)), True
+
+    def search(self, query="", tiers=None, classes=None, percentage=None):
+        """Row positions of learners matching ``query`` and the filters, in roster order; and whether fuzzy.
+
+        Every word of ``query`` must start a word of the name; a query that
+        is just a learner number ("12" or "#12") finds that row. Empty filters
+        match everyone; ``percentage`` is an inclusive ``(low, high)`` range.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        fuzzy = False
+        number = LEARNER_NUMBER.fullmatch(query.strip())
+        if number and 1 <= int(number[1]) <= len(self):
+            mask[:] = False
+            mask[int(number[1]) - 1] = True
+        else:
+            for word in WORD.findall(normalize(query)):
+                rows, close = self._word_rows(word)
+                fuzzy |= close
+                matched = np.zeros(len(self), dtype=bool)
+                matched[rows] = True
+                mask &= matched
+        if tiers:
+            mask &= np.isin(self.tiers, list(tiers))
+        if classes and self.classes is not None:
+            mask &= np.isin(self.classes, list(classes))
+        if percentage is not None:
+            low, high = percentage
+            mask &= (self.percentage >= low) & (self.percentage <= high)
+        return np.flatnonzero(mask), fuzzy
+
+
+def n_pages(positions, per_page=RESULTS_PER_PAGE):
+    return max(1, -(-len(positions) // per_page))
+
+
+def result_page(positions, page, per_page=RESULTS_PER_PAGE):
+    """The 1-based ``page`` of search results."""
+    return positions[(page - 1) * per_page:page * per_page]
+
+
+def build_index(df, name_col):
+    names = df[name_col].astype(str).to_numpy(dtype=object)
+    words, word_rows = [], []
+    for row, name in enumerate(names):
+        for word in WORD.findall(normalize(name)):
+            words.append(word)
+            word_rows.append(row)
+    words = np.array(words, dtype=str)
+    order = np.argsort(words, kind='stable')
+    return LearnerIndex(
+        names=names,
+        percentage=df['Percentage'].to_numpy(dtype=float),
+        tiers=assign_tiers(df['Percentage']).astype(object).to_numpy(),
+        classes=df[CLASS_COL].astype(str).to_numpy(dtype=object) if CLASS_COL in df.columns else None,
+        words=words[order],
+        word_rows=np.array(word_rows, dtype=np.intp)[order],
+        vocabulary=np.unique(words).tolist(),
+    )
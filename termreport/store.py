@@ -0,0 +1,84 @@
+"""Process-wide store of parsed datasets.
+
+Parsed assessments are keyed by ``(content hash, sheet)`` and shared by every
+Streamlit session that uploads the same file. The store is bounded by an
+approximate memory cap (``TERMREPORT_STORE_MB``, default 512) and evicts the
+least recently used dataset first. Sessions keep only the key and read
+through :meth:`DatasetStore.view`, which hands out shallow copies so pages
+cannot modify the shared frame.
+"""
+import dataclasses
+import os
+import threading
+from collections import OrderedDict
+
+STORE_MAX_BYTES = int(os.environ.get("TERMREPORT_STORE_MB", 512)) * 2**20
+
+
+def dataset_nbytes(value):
+    if isinstance(value, list):
+        return sum(dataset_nbytes(item) for item in value)
+    if hasattr(value, 'nbytes'):
+        return value.nbytes
+    return int(value.df.memory_usage(deep=True).sum())
+
+
+class DatasetStore:
+    def __init__(self, max_bytes=STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        nbytes = dataset_nbytes(value)
+        with self._lock:
+            if key in self._items:
+                self.size -= self._sizes.pop(key)
+                del self._items[key]
+            self._items[key] = value
+            self._sizes[key] = nbytes
+            self.size += nbytes
+            while self.size > self.max_bytes and len(self._items) > 1:
+                evicted, _ = self._items.popitem(last=False)
+                self.size -= self._sizes.pop(evicted)
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._items:
+                del self._items[key]
+                self.size -= self._sizes.pop(key)
+
+    def view(self, key):
+        """Return a read-only view of a stored :class:`~termreport.ingest.Assessment`, or ``None`` if evicted."""
+        assessment = self.get(key)
+        if assessment is None:
+            return None
+        return dataclasses.replace(assessment, df=assessment.df.copy(deep=False),
+                                   question_cols=list(assessment.question_cols))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.size = 0
+
+
+datasets = DatasetStore()
@@ -0,0 +1,144 @@
+"""Lightweight timing spans, structured logs and optional profiling.
+
+Each session keeps a :class:`Timings` that records how long named pipeline
+stages took over its recent reruns; work done off the script thread (report
+builds) is recorded in the process-wide :data:`server` instance. A span costs
+two ``perf_counter`` calls and a deque append, so instrumentation stays on in
+production.
+
+Every span is also logged to the ``termreport`` logger as one JSON object per
+line. The level comes from ``TERMREPORT_LOG_LEVEL`` (default ``WARNING``, so
+spans are not written unless it is set to ``INFO`` or ``DEBUG``).
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+HISTORY = 50  # Durations kept per stage
+PROFILE_LINES = 30
+
+logger = logging.getLogger("termreport")
+
+
+def configure_logging(level=None):
+    """Send ``termreport`` logs to stderr once per process."""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level or os.environ.get("TERMREPORT_LOG_LEVEL", "WARNING").upper())
+    logger.propagate = False
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+class Timings:
+    """Recent durations per named stage, plus the last cProfile capture."""
+
+    def __init__(self, session=None, history=HISTORY):
+        self.session = session or uuid.uuid4().hex[:8]
+        self.spans = defaultdict(lambda: deque(maxlen=history))
+        self.profile_text = None
+        self.profile_data = None
+        self._profiler = None
+        self.rerun_started = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """Time the enclosed block as ``stage``; extra fields go to the log line only."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, **fields)
+
+    def record(self, stage, seconds, **fields):
+        with self._lock:
+            self.spans[stage].append(seconds)
+        log_event("span", session=self.session, stage=stage, ms=round(seconds * 1000, 2), **fields)
+
+    def summary(self):
+        """Calls, last, mean and 95th-percentile latency (ms) per stage."""
+        with self._lock:
+            spans = {stage: list(durations) for stage, durations in self.spans.items()}
+        rows = {
+            stage: {
+                'Calls': len(durations),
+                'Last ms': durations[-1] * 1000,
+                'Mean ms': np.mean(durations) * 1000,
+                'p95 ms': np.percentile(durations, 95) * 1000,
+            }
+            for stage, durations in spans.items()
+        }
+        summary = pd.DataFrame.from_dict(rows, orient='index', columns=['Calls', 'Last ms', 'Mean ms', 'p95 ms'])
+        summary.index.name = 'Stage'
+        return summary
+
+    def start_profile(self):
+        """Profile the current thread until :meth:`stop_profile`; a no-op if another profiler is active."""
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError:
+            self._profiler = None
+
+    def stop_profile(self):
+        """Keep the capture's top functions as text and its raw stats for download."""
+        if self._profiler is None:
+            return
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        self.profile_text = out.getvalue()
+        profiler.create_stats()
+        self.profile_data = marshal.dumps(profiler.stats)  # Loadable with pstats / snakeviz
+        log_event("profile", session=self.session, lines=PROFILE_LINES)
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+
+def session_timings(state):
+    """The :class:`Timings` kept in a session's state mapping, created on first use."""
+    if 'timings' not in state:
+        state['timings'] = Timings()
+    return state['timings']
+
+
+def cache_stats(caches):
+    """Hit counts, hit rate and size (MB) for named caches with ``hits``, ``misses`` and ``size``."""
+    rows = {}
+    for name, cache in caches.items():
+        lookups = cache.hits + cache.misses
+        rows[name] = {
+            'Hits': cache.hits,
+            'Misses': cache.misses,
+            'Hit rate': cache.hits / lookups if lookups else np.nan,
+            'Size MB': cache.size / 2**20,
+        }
+    summary = pd.DataFrame.from_dict(rows, orient='index', columns=['Hits', 'Misses', 'Hit rate', 'Size MB'])
+    summary.index.name = 'Cache'
+    return summary
+
+
+server = Timings(session="server")
+configure_logging()
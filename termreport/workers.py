@@ -0,0 +1,203 @@
+"""Shared process pool for heavy rendering and export work.
+
+All sessions send workbook parsing, chart rendering and report assembly to
+one bounded pool of worker processes (``TERMREPORT_WORKERS``, default up to
+4; 0 runs everything in the calling thread). Workers are started with
+forkserver (spawn where that is unavailable), never forked from the
+multi-threaded server. Requests wait in one queue per session and sessions
+are served in turn, so a session drawing dozens of charts cannot starve a
+session waiting for one. Requests with the same key share a single result
+while queued or running.
+
+The pool only runs once :meth:`WorkerPool.start` has been called (the
+dashboard does so at startup); until then, and inside worker processes,
+:meth:`WorkerPool.submit` runs the function inline, so the CLI and scripts
+behave as before.
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import types
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import partial
+
+WORKERS = int(os.environ.get("TERMREPORT_WORKERS", min(4, os.cpu_count() or 1)))
+PROGRESS_POLL = 0.25  # Seconds between checks for the end of a task that reports progress
+# Forking a multi-threaded server can copy locks held by other threads into the workers
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+@contextmanager
+def _without_main():
+    # Spawned workers re-run the parent's __main__ script, and under Streamlit
+    # that is the dashboard itself; hide it while worker processes start
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def _reporting(updates, fn, args, kwargs):
+    # Worker side of WorkerPool.run(progress=...): progress calls are sent back over ``updates``
+    return fn(*args, progress=lambda fraction, section: updates.put((fraction, section)), **kwargs)
+
+
+def _warm_up():
+    # Import the rendering stack once per worker instead of on its first real job
+    import termreport.report  # noqa: F401
+
+
+class WorkerPool:
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.submitted = 0
+        self.deduplicated = 0
+        self._executor = None
+        self._manager = None  # Serves the queues that relay progress from workers
+        self._pid = None
+        self._queues = OrderedDict()  # Session -> its waiting tasks, in serving order
+        self._futures = {}  # Key -> Future of a queued or running task
+        self._running = 0
+        self._lock = threading.RLock()
+
+    @property
+    def started(self):
+        return self._executor is not None and self._pid == os.getpid()
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def queued(self):
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def start(self):
+        """Start the worker processes; safe to call on every rerun."""
+        with self._lock:
+            if self.workers > 0 and not self.started:
+                # The executor starts a process per submitted task until it has them all,
+                # so every worker is started here
+                with _without_main():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context(START_METHOD))
+                    self._pid = os.getpid()
+                    for _ in range(self.workers):
+                        self._executor.submit(_warm_up)
+        return self
+
+    def submit(self, key, fn, *args, session=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` for ``session`` and return a Future of its result.
+
+        ``fn`` and its arguments must be picklable. Requests with the same
+        non-``None`` ``key`` share one Future while it is queued or running.
+        """
+        if not self.started:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self._lock:
+            self.submitted += 1
+            if key is not None and key in self._futures:
+                self.deduplicated += 1
+                return self._futures[key]
+            future = Future()
+            if key is not None:
+                self._futures[key] = future
+            self._queues.setdefault(session, deque()).append((key, fn, args, kwargs, future))
+            self._dispatch()
+        return future
+
+    def run(self, key, fn, *args, session=None, progress=None, **kwargs):
+        """Like :meth:`submit`, but wait for and return the result.
+
+        With ``progress``, ``fn`` is also passed a ``progress(fraction,
+        section)`` callback, and its calls are relayed to ``progress`` in the
+        calling thread while the task runs.
+        """
+        if progress is None or not self.started:
+            if progress is not None:
+                kwargs['progress'] = progress
+            return self.submit(key, fn, *args, session=session, **kwargs).result()
+        updates = self._updates()
+        future = self.submit(key, _reporting, updates, fn, args, kwargs, session=session)
+        while True:
+            try:
+                progress(*updates.get(timeout=PROGRESS_POLL))
+            except queue.Empty:
+                if future.done():
+                    break
+        return future.result()
+
+    def _updates(self):
+        with self._lock:
+            if self._manager is None:
+                with _without_main():
+                    self._manager = multiprocessing.get_context(START_METHOD).Manager()
+            return self._manager.Queue()
+
+    def _dispatch(self):
+        # Called with the lock held: start waiting tasks while workers are
+        # free, taking one task from each session in turn
+        while self._running < self.workers and self._queues:
+            session, queue = next(iter(self._queues.items()))
+            key, fn, args, kwargs, future = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            self._running += 1
+            executor = self._executor
+            try:
+                inner = executor.submit(fn, *args, **kwargs)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._finish(executor, key, future, error=e)
+                continue
+            inner.add_done_callback(partial(self._done, executor, key, future))
+
+    def _done(self, executor, key, future, inner):
+        error = inner.exception()
+        if error is None:
+            self._finish(executor, key, future, result=inner.result())
+        else:
+            self._finish(executor, key, future, error=error)
+
+    def _finish(self, executor, key, future, result=None, error=None):
+        with self._lock:
+            self._running -= 1
+            if key is not None:
+                self._futures.pop(key, None)
+            if isinstance(error, BrokenProcessPool) and executor is self._executor:
+                # A worker died; later requests get a fresh pool. Other tasks of
+                # the broken executor fail too, but it is only replaced once
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.start()
+            self._dispatch()
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def shutdown(self):
+        with self._lock:
+            if self.started:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                if self._manager is not None:
+                    self._manager.shutdown()
+            self._executor = None
+            self._manager = None
+
+
+pool = WorkerPool()